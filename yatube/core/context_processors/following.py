@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from posts.follows import following_ids
+
+
+def following(request):
+    return {
+        'following_ids': SimpleLazyObject(
+            lambda: following_ids(request.user)
+        )
+    }
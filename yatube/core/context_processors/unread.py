@@ -0,0 +1,11 @@
+from django.utils.functional import SimpleLazyObject
+
+from posts.unread import unread_count
+
+
+def unread(request):
+    return {
+        'unread_count': SimpleLazyObject(
+            lambda: unread_count(request.user)
+        )
+    }
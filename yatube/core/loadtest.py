@@ -0,0 +1,151 @@
+import random
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+PASSWORD = 'loadtest-password'
+
+
+def anonymous_index(user, anonymous, site):
+    return 'index', anonymous.get(site.url('/'))
+
+
+def anonymous_group(user, anonymous, site):
+    if not site.groups:
+        return anonymous_index(user, anonymous, site)
+    return 'group', anonymous.get(
+        site.url(f'/group/{random.choice(site.groups)}/')
+    )
+
+
+def anonymous_post(user, anonymous, site):
+    return 'post_detail', anonymous.get(
+        site.url(f'/posts/{random.choice(site.posts)}/')
+    )
+
+
+def follow_index(user, anonymous, site):
+    return 'follow_index', user.get(site.url('/follow/'))
+
+
+def post_create(user, anonymous, site):
+    return 'post_create', user.post(site.url('/create/'), data={
+        'text': 'Нагрузочный пост',
+        'csrfmiddlewaretoken': user.cookies['csrftoken'],
+    }, allow_redirects=False)
+
+
+def add_comment(user, anonymous, site):
+    post_id = random.choice(site.posts)
+    return 'add_comment', user.post(
+        site.url(f'/posts/{post_id}/comment/'),
+        data={
+            'text': 'Нагрузочный комментарий',
+            'csrfmiddlewaretoken': user.cookies['csrftoken'],
+        },
+        allow_redirects=False,
+    )
+
+
+MIX = (
+    (anonymous_index, 40),
+    (anonymous_group, 10),
+    (anonymous_post, 15),
+    (follow_index, 20),
+    (post_create, 5),
+    (add_comment, 10),
+)
+
+
+class Site:
+    def __init__(self, base_url, posts, groups):
+        self.base_url = base_url.rstrip('/')
+        self.posts = posts
+        self.groups = groups
+
+    def url(self, path):
+        return self.base_url + path
+
+
+def login(site, username):
+    session = requests.Session()
+    session.get(site.url('/auth/login/'))
+    session.post(site.url('/auth/login/'), data={
+        'username': username,
+        'password': PASSWORD,
+        'csrfmiddlewaretoken': session.cookies['csrftoken'],
+    })
+    # Форма создания поста выставляет свежий csrftoken после логина.
+    session.get(site.url('/create/'))
+    return session
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def summarize(samples, elapsed):
+    report = {}
+    for endpoint, rows in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in rows)
+        statuses = defaultdict(int)
+        for _, status in rows:
+            statuses[status] += 1
+        errors = sum(
+            count for status, count in statuses.items()
+            if status is None or status >= 500
+        )
+        report[endpoint] = {
+            'requests': len(rows),
+            'throughput': len(rows) / elapsed,
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'error_rate': errors / len(rows),
+            'rate_limited': statuses.get(429, 0),
+            'statuses': {str(key): value for key, value in statuses.items()},
+        }
+    total = sum(len(rows) for rows in samples.values())
+    return {
+        'elapsed': elapsed,
+        'requests': total,
+        'throughput': total / elapsed,
+        'endpoints': report,
+    }
+
+
+def run(site, usernames, duration, concurrency, mix=MIX):
+    """Гоняет смесь сценариев concurrency потоками duration секунд.
+
+    Каждый поток работает под своим пользователем из usernames.
+    Задержки в отчёте — в секундах.
+    """
+    scenarios = [scenario for scenario, _ in mix]
+    weights = [weight for _, weight in mix]
+    deadline = time.monotonic() + duration
+
+    def worker(username):
+        user = login(site, username)
+        anonymous = requests.Session()
+        samples = defaultdict(list)
+        while time.monotonic() < deadline:
+            scenario = random.choices(scenarios, weights)[0]
+            started = time.monotonic()
+            try:
+                endpoint, response = scenario(user, anonymous, site)
+                status = response.status_code
+            except requests.RequestException:
+                endpoint, status = scenario.__name__, None
+            samples[endpoint].append((time.monotonic() - started, status))
+        return samples
+
+    started = time.monotonic()
+    merged = defaultdict(list)
+    workers = (usernames[i % len(usernames)] for i in range(concurrency))
+    with ThreadPoolExecutor(concurrency) as pool:
+        for samples in pool.map(worker, workers):
+            for endpoint, rows in samples.items():
+                merged[endpoint].extend(rows)
+    return summarize(merged, time.monotonic() - started)
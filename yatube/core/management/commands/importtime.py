@@ -0,0 +1,84 @@
+import json
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PREFIX = 'import time:'
+
+
+def parse(stderr):
+    """Строки -X importtime -> [(модуль, глубина, self, cumulative)], мкс."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith(PREFIX):
+            continue
+        self_us, cumulative_us, name = line[len(PREFIX):].split('|')
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def by_package(rows):
+    totals = defaultdict(int)
+    for name, _, self_us, _ in rows:
+        totals[name.split('.')[0]] += self_us
+    return sorted(totals.items(), key=lambda item: -item[1])
+
+
+class Command(BaseCommand):
+    help = 'Профиль времени импорта для команды manage.py (-X importtime)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'target', nargs='*', default=['check'],
+            help='профилируемая команда manage.py, по умолчанию check'
+        )
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', 'manage.py',
+             *options['target']],
+            cwd=settings.BASE_DIR,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        rows = parse(result.stderr)
+        top_level = [row for row in rows if row[1] == 0]
+        report = {
+            'total_ms': sum(row[3] for row in top_level) / 1000,
+            'modules': len(rows),
+            'slowest': [
+                {'module': name, 'self_ms': self_us / 1000,
+                 'cumulative_ms': cumulative_us / 1000}
+                for name, _, self_us, cumulative_us in sorted(
+                    top_level, key=lambda row: -row[3]
+                )[:options['limit']]
+            ],
+            'packages': [
+                {'package': package, 'self_ms': self_us / 1000}
+                for package, self_us in by_package(rows)[:options['limit']]
+            ],
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        self.stdout.write(
+            f'Импорт: {report["total_ms"]:.0f} мс, '
+            f'модулей: {report["modules"]}'
+        )
+        self.stdout.write('\nСамые долгие импорты верхнего уровня:')
+        for row in report['slowest']:
+            self.stdout.write(
+                f'{row["cumulative_ms"]:9.1f} мс  {row["module"]}'
+            )
+        self.stdout.write('\nСобственное время по пакетам:')
+        for row in report['packages']:
+            self.stdout.write(f'{row["self_ms"]:9.1f} мс  {row["package"]}')
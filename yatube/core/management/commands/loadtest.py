@@ -0,0 +1,84 @@
+import json
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import loadtest
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return True
+        time.sleep(0.1)
+    return False
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный тест: смесь чтений и записей, отчёт в JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', help='адрес запущенного сервера; по умолчанию '
+                          'поднимается локальный на --port'
+        )
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--output', help='файл для JSON-отчёта')
+
+    def prepare(self, concurrency):
+        usernames = [f'loadtest{i}' for i in range(concurrency)]
+        for username in usernames:
+            user, created = User.objects.get_or_create(username=username)
+            if created:
+                user.set_password(loadtest.PASSWORD)
+                user.save()
+        if not Post.objects.exists():
+            Post.objects.create(author=user, text='Нагрузочный пост')
+        posts = list(Post.objects.values_list('pk', flat=True)[:1000])
+        groups = list(Group.objects.values_list('slug', flat=True)[:100])
+        return usernames, posts, groups
+
+    def handle(self, *args, **options):
+        usernames, posts, groups = self.prepare(options['concurrency'])
+        server = None
+        url = options['url']
+        if not url:
+            url = f'http://127.0.0.1:{options["port"]}'
+            server = subprocess.Popen(
+                [sys.executable, 'manage.py', 'runserver',
+                 f'127.0.0.1:{options["port"]}', '--noreload'],
+                cwd=settings.BASE_DIR,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            if not wait_for_port(options['port'], 30):
+                server.terminate()
+                raise CommandError('Сервер не запустился')
+        try:
+            report = loadtest.run(
+                loadtest.Site(url, posts, groups),
+                usernames,
+                options['duration'],
+                options['concurrency'],
+            )
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        self.stdout.write(output)
@@ -0,0 +1,63 @@
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+PROBE = '''
+import json, os, sys, time
+started = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+import django
+django.setup()
+ready = time.perf_counter()
+from django.test import Client
+status = Client().get(sys.argv[1]).status_code
+print(json.dumps({
+    'setup_ms': (ready - started) * 1000,
+    'response_ms': (time.perf_counter() - ready) * 1000,
+    'status': status,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Время от запуска процесса до первого ответа приложения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--target-ms', type=float, default=1000,
+            help='допустимая медиана времени до первого ответа'
+        )
+
+    def handle(self, *args, **options):
+        runs = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-c', PROBE, options['path']],
+                cwd=settings.BASE_DIR,
+                stdout=subprocess.PIPE,
+                check=True,
+                universal_newlines=True,
+            ).stdout
+            total_ms = (time.perf_counter() - started) * 1000
+            runs.append({**json.loads(output.splitlines()[-1]),
+                         'total_ms': total_ms})
+        report = {
+            key: statistics.median(run[key] for run in runs)
+            for key in ('setup_ms', 'response_ms', 'total_ms')
+        }
+        report['target_ms'] = options['target_ms']
+        report['status'] = runs[-1]['status']
+        self.stdout.write(json.dumps(report))
+        if report['total_ms'] > options['target_ms']:
+            raise CommandError(
+                f'Первый ответ через {report["total_ms"]:.0f} мс, '
+                f'цель {options["target_ms"]:.0f} мс'
+            )
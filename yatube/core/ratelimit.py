@@ -0,0 +1,135 @@
+import math
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+DEFAULT_METHODS = ('POST',)
+# Корзину читает и пишет один запрос за раз; блокировка зависшего
+# процесса истекает сама через LOCK_TIMEOUT.
+LOCK_TIMEOUT: int = 1
+LOCK_WAIT: float = 0.001
+
+
+def parse_rate(rate):
+    """'10/m' -> (10, 60): ёмкость корзины и время её полного наполнения."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period]
+
+
+def client_ip(request):
+    """Адрес клиента: за доверенным прокси — из его заголовка.
+
+    Прокси дописывает адрес клиента в конец X-Forwarded-For, поэтому
+    берётся последнее значение: начало заголовка подделывает кто угодно.
+    """
+    header = getattr(settings, 'RATELIMIT_IP_HEADER', None)
+    if header and request.META.get(header):
+        return request.META[header].split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def identity(request, scope):
+    """Ключ корзины: у каждой области свой префикс, даже для гостя."""
+    if scope == 'user' and request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return f'{scope}:ip:{client_ip(request)}'
+
+
+@contextmanager
+def locked(keys):
+    """Захватывает блокировки корзин по порядку ключей."""
+    token = uuid.uuid4().hex
+    held = []
+    try:
+        for key in sorted(keys):
+            lock = f'{key}:lock'
+            while not cache.add(lock, token, LOCK_TIMEOUT):
+                time.sleep(LOCK_WAIT)
+            held.append(lock)
+        yield
+    finally:
+        for lock in held:
+            if cache.get(lock) == token:
+                cache.delete(lock)
+
+
+def take(name, request, rates):
+    """Забирает по жетону из всех корзин политики.
+
+    Возвращает 0, если запрос разрешён, иначе число секунд до появления
+    жетона. Чтение и запись корзин идут под их блокировками, иначе
+    одновременные запросы видят одни и те же жетоны и проходят все.
+    """
+    buckets = {
+        f'ratelimit:{name}:{identity(request, scope)}': parse_rate(rate)
+        for scope, rate in rates.items()
+    }
+    with locked(buckets):
+        return take_locked(buckets)
+
+
+def take_locked(buckets):
+    now = time.time()
+    state = cache.get_many(buckets)
+    retry_after = 0
+    updates = {}
+    for key, (capacity, period) in buckets.items():
+        refill = capacity / period
+        tokens, updated = state.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        if tokens < 1:
+            retry_after = max(retry_after, (1 - tokens) / refill)
+        updates[key] = (tokens - 1, now)
+    if retry_after:
+        return math.ceil(retry_after)
+    cache.set_many(updates, max(period for _, period in buckets.values()))
+    return 0
+
+
+def too_many_requests(request, retry_after):
+    response = render(request, 'core/429.html', status=429)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+
+def ratelimit(name, methods=DEFAULT_METHODS, **rates):
+    """Ограничивает частоту запросов к view: @ratelimit('x', user='5/m')."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = take(name, request, rates)
+                if retry_after:
+                    return too_many_requests(request, retry_after)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class RateLimitMiddleware:
+    """Применяет политики settings.RATELIMITS по имени view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        name = request.resolver_match.view_name
+        policy = getattr(settings, 'RATELIMITS', {}).get(name)
+        if policy is None:
+            return None
+        rates = dict(policy)
+        if request.method not in rates.pop('methods', DEFAULT_METHODS):
+            return None
+        retry_after = take(name, request, rates)
+        if retry_after:
+            return too_many_requests(request, retry_after)
+        return None
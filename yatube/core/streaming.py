@@ -0,0 +1,47 @@
+import uuid
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.template.context import make_context
+from django.template.loader import get_template, render_to_string
+
+CHUNK_SIZE: int = 20
+
+
+def stream_render(request, template_name, context, items, item_template,
+                  item_name, chunk_size=CHUNK_SIZE):
+    """Отдаёт страницу потоком: сначала всё до списка, затем список кусками.
+
+    В шаблоне страницы место списка отмечено {{ stream }}. Каркас
+    страницы рендерится сразу, поэтому заголовок и шапка уходят клиенту
+    до того, как начнётся чтение items. Каждый элемент рендерится шаблоном
+    item_template с переменными item_name и first. QuerySet читается
+    курсором по chunk_size строк, так что в памяти держится не больше
+    chunk_size строк и готовых элементов.
+    """
+    if isinstance(items, QuerySet):
+        items = items.iterator(chunk_size=chunk_size)
+    marker = f'stream-{uuid.uuid4().hex}'
+    page = render_to_string(
+        template_name, {**context, 'stream': marker}, request
+    )
+    head, tail = page.split(marker, 1)
+    item = get_template(item_template).template
+    item_context = make_context(context, request)
+
+    def body():
+        yield head
+        # Контекст-процессоры выполняются один раз на весь список.
+        with item_context.bind_template(item):
+            chunk = []
+            for number, obj in enumerate(items):
+                values = {item_name: obj, 'first': not number}
+                with item_context.push(**values):
+                    chunk.append(item.render(item_context))
+                if len(chunk) == chunk_size:
+                    yield ''.join(chunk)
+                    chunk = []
+            yield ''.join(chunk)
+        yield tail
+
+    return StreamingHttpResponse(body())
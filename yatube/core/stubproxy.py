@@ -0,0 +1,81 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+PURGE_PATH = '/purge'
+HEADER = 'Surrogate-Key'
+
+
+class Handler(BaseHTTPRequestHandler):
+    """GET — из кеша или с upstream, POST /purge — сброс по ключам."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        proxy = self.server.proxy
+        with proxy.lock:
+            entry = proxy.cache.get(self.path)
+        state = 'HIT'
+        if entry is None:
+            state = 'MISS'
+            response = requests.get(
+                proxy.upstream + self.path, allow_redirects=False
+            )
+            keys = set(response.headers.get(proxy.header, '').split())
+            entry = (response.status_code, response.content, keys)
+            if response.status_code == 200:
+                with proxy.lock:
+                    proxy.cache[self.path] = entry
+        status, body, keys = entry
+        self.send_response(status)
+        self.send_header('X-Cache', state)
+        self.send_header(proxy.header, ' '.join(sorted(keys)))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        proxy = self.server.proxy
+        if self.path != PURGE_PATH:
+            self.send_error(404)
+            return
+        length = int(self.headers.get('Content-Length', 0))
+        keys = set(json.loads(self.rfile.read(length))['surrogate_keys'])
+        with proxy.lock:
+            proxy.purges.append(sorted(keys))
+            for path, (_, _, tags) in list(proxy.cache.items()):
+                if tags & keys:
+                    del proxy.cache[path]
+        self.send_response(204)
+        self.end_headers()
+
+
+class StubProxy:
+    """Кеширующий прокси в памяти с очисткой по surrogate-ключам.
+
+    Для тестов и локальной проверки: слушает свободный порт на
+    127.0.0.1, кеширует ответы 200 целиком по пути запроса и
+    записывает каждый пришедший батч ключей в purges.
+    """
+
+    def __init__(self, upstream, header=HEADER):
+        self.upstream = upstream.rstrip('/')
+        self.header = header
+        self.cache = {}
+        self.purges = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.proxy = self
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.purge_url = self.url + PURGE_PATH
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
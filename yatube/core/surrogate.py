@@ -0,0 +1,25 @@
+from django.conf import settings
+
+DEFAULT_HEADER = 'Surrogate-Key'
+
+
+def add(request, *keys):
+    """Помечает ответ на request ключами для точечной очистки кеша прокси."""
+    if not hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys = set()
+    request.surrogate_keys.update(keys)
+
+
+class SurrogateKeyMiddleware:
+    """Выставляет собранные view ключи в заголовок ответа."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        keys = getattr(request, 'surrogate_keys', None)
+        if keys:
+            header = getattr(settings, 'SURROGATE_KEY_HEADER', DEFAULT_HEADER)
+            response[header] = ' '.join(sorted(keys))
+        return response
@@ -0,0 +1,384 @@
+import json
+import threading
+import time
+import tracemalloc
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+import requests
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.backends.base import BaseCache
+from django.core.management import call_command
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import (Client, LiveServerTestCase, RequestFactory, TestCase,
+                         override_settings)
+from django.urls import reverse
+
+from posts import archive, moderation, purge
+from posts.models import Comment, Group, Post, User
+
+from . import loadtest
+from .management.commands.importtime import by_package, parse
+from .ratelimit import ratelimit, take
+from .streaming import CHUNK_SIZE, stream_render
+from .stubproxy import StubProxy
+
+RATELIMITS = {
+    'posts:add_comment': {'user': '5/m', 'ip': '100/m'},
+    'users:signup': {'ip': '2/m'},
+}
+
+
+@override_settings(RATELIMITS=RATELIMITS)
+class RateLimitTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_write_rate_capped(self):
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        with mock.patch('core.ratelimit.time.time', return_value=1000.0):
+            statuses = [
+                self.client.post(url, {'text': str(i)}).status_code
+                for i in range(50)
+            ]
+            response = self.client.post(url, {'text': 'ещё'})
+        self.assertEqual(Comment.objects.count(), 5)
+        self.assertEqual(statuses.count(HTTPStatus.FOUND), 5)
+        self.assertEqual(statuses.count(HTTPStatus.TOO_MANY_REQUESTS), 45)
+        self.assertEqual(response['Retry-After'], '12')
+
+        with mock.patch('core.ratelimit.time.time', return_value=1012.0):
+            self.client.post(url, {'text': 'после паузы'})
+            self.client.post(url, {'text': 'снова рано'})
+        self.assertEqual(Comment.objects.count(), 6)
+
+    def test_reads_not_limited(self):
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        for _ in range(10):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_anonymous_limited_by_ip(self):
+        url = reverse('users:signup')
+        guest = Client()
+        statuses = [
+            guest.post(url, {'username': f'new{i}'}).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses[-1], HTTPStatus.TOO_MANY_REQUESTS)
+        other = Client(REMOTE_ADDR='10.0.0.1')
+        response = other.post(url, {'username': 'other'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(RATELIMIT_IP_HEADER='HTTP_X_FORWARDED_FOR')
+    def test_ip_from_proxy_header(self):
+        url = reverse('users:signup')
+        first = Client(HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.1')
+        for i in range(3):
+            response = first.post(url, {'username': f'new{i}'})
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        second = Client(HTTP_X_FORWARDED_FOR='1.1.1.1, 10.0.0.2')
+        response = second.post(url, {'username': 'other'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_concurrent_requests_share_tokens(self):
+        request = RequestFactory().post('/')
+        request.user = self.user
+        get_many = BaseCache.get_many
+
+        def slow_get_many(cache, keys, **kwargs):
+            # Расширяет окно между чтением корзины и её записью.
+            state = get_many(cache, keys, **kwargs)
+            time.sleep(0.01)
+            return state
+
+        start = threading.Barrier(20)
+        allowed = []
+
+        def worker():
+            start.wait()
+            if not take('test', request, {'user': '5/m'}):
+                allowed.append(True)
+
+        threads = [threading.Thread(target=worker) for _ in range(20)]
+        with mock.patch.object(BaseCache, 'get_many', slow_get_many):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(allowed), 5)
+
+    def test_guest_scopes_not_shared(self):
+        @ratelimit('test', user='1/m', ip='2/m')
+        def view(request):
+            return HttpResponse()
+
+        request = RequestFactory().post('/')
+        request.user = AnonymousUser()
+        self.assertEqual(view(request).status_code, HTTPStatus.OK)
+        response = view(request)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+
+    def test_decorator(self):
+        @ratelimit('test', user='1/m')
+        def view(request):
+            return HttpResponse()
+
+        factory = RequestFactory()
+        request = factory.post('/')
+        request.user = self.user
+        self.assertEqual(view(request).status_code, HTTPStatus.OK)
+        response = view(request)
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(view(factory.get('/')).status_code, HTTPStatus.OK)
+
+
+class LoadTestHarnessTest(LiveServerTestCase):
+
+    def test_report(self):
+        author = User.objects.create_user(
+            username='loadtest0', password=loadtest.PASSWORD
+        )
+        post = Post.objects.create(author=author, text='Тестовый пост')
+        report = loadtest.run(
+            loadtest.Site(self.live_server_url, [post.pk], []),
+            [author.username],
+            duration=0.5,
+            concurrency=2,
+        )
+        self.assertGreater(report['requests'], 0)
+        for endpoint, stats in report['endpoints'].items():
+            with self.subTest(endpoint=endpoint):
+                self.assertEqual(stats['error_rate'], 0)
+                self.assertLessEqual(stats['p50'], stats['p99'])
+
+
+class StartupToolsTest(TestCase):
+
+    def test_parse_importtime(self):
+        rows = parse(
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |     django.utils\n'
+            'import time:       300 |        400 |   django.core\n'
+            'import time:        50 |        450 | posts.models\n'
+        )
+        self.assertEqual(rows[1], ('django.core', 1, 300, 400))
+        self.assertEqual(rows[2][1], 0)
+        self.assertEqual(by_package(rows), [('django', 400), ('posts', 50)])
+
+    def test_startup_benchmark(self):
+        out = StringIO()
+        call_command(
+            'startup_benchmark', runs=1, path='/about/author/',
+            target_ms=60000, stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['status'], HTTPStatus.OK)
+        self.assertGreater(report['total_ms'], report['setup_ms'])
+
+
+# Страница со списком во всю длину: такие и отдаются потоком.
+STREAM_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [
+            ('django.template.loaders.locmem.Loader', {
+                'stream_page.html': (
+                    "{% extends 'base.html' %}"
+                    '{% block content %}{{ stream }}{% endblock %}'
+                ),
+            }),
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ],
+    },
+}]
+
+
+@override_settings(TEMPLATES=STREAM_TEMPLATES)
+class StreamRenderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Пост номер {i}')
+            for i in range(500)
+        )
+        archive.rebuild()
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.user = self.author
+        return request
+
+    def stream(self, items=None):
+        if items is None:
+            items = Post.objects.select_related('author')
+        return stream_render(
+            self.request(), 'stream_page.html', {}, items,
+            'posts/includes/post_item.html', 'post',
+        )
+
+    def test_whole_page_streamed(self):
+        response = self.stream()
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        self.assertLess(content.index('<header'), content.index('<article'))
+        self.assertEqual(content.count('<article'), 500)
+        self.assertEqual(content.count('<hr>'), 499)
+        self.assertTrue(content.rstrip().endswith('</html>'))
+
+    def test_first_byte_and_memory(self):
+        read = []
+
+        def posts():
+            for post in Post.objects.select_related('author').iterator():
+                read.append(post.pk)
+                yield post
+
+        chunks = iter(self.stream(posts()).streaming_content)
+        # Шапка уходит до первого чтения списка, дальше — по CHUNK_SIZE.
+        self.assertIn(b'<header', next(chunks))
+        self.assertEqual(read, [])
+        next(chunks)
+        self.assertEqual(len(read), CHUNK_SIZE)
+
+        tracemalloc.start()
+        for _ in chunks:
+            pass
+        streamed_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.assertEqual(len(read), 500)
+
+        # Так работает render(): всё тело собирается до отправки.
+        tracemalloc.start()
+        b''.join(self.stream().streaming_content)
+        full_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.assertLess(streamed_peak * 2, full_peak)
+
+
+class SurrogateKeyTest(LiveServerTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description=''
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост'
+        )
+
+    def test_pages_tagged(self):
+        post_keys = f'author-{self.author.pk} group-{self.group.pk} ' \
+            f'post-{self.post.pk}'
+        for url, keys in (
+            (reverse('posts:index'), post_keys + ' posts'),
+            (reverse('posts:group_posts', args=['test_slug']), post_keys),
+            (reverse('posts:profile', args=['author']), post_keys),
+            (reverse('posts:post_detail', args=[self.post.pk]), post_keys),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url)['Surrogate-Key'], keys)
+
+    def test_edit_purges_proxy(self):
+        path = reverse('posts:post_detail', args=[self.post.pk])
+        with StubProxy(self.live_server_url) as proxy:
+            with self.settings(SURROGATE_PURGE_ENDPOINTS=[proxy.purge_url]):
+                miss = requests.get(proxy.url + path)
+                hit = requests.get(proxy.url + path)
+                # Изменения одной транзакции уходят одним батчем.
+                with transaction.atomic():
+                    self.post.text = 'Новый текст'
+                    self.post.save()
+                    Comment.objects.create(
+                        post=self.post, author=self.author, text='Комментарий'
+                    )
+                call_command('run_worker', processes=0, once=True,
+                             stdout=StringIO())
+                fresh = requests.get(proxy.url + path)
+
+        self.assertEqual(miss.headers['X-Cache'], 'MISS')
+        self.assertEqual(hit.headers['X-Cache'], 'HIT')
+        self.assertEqual(len(proxy.purges), 1)
+        self.assertIn(f'post-{self.post.pk}', proxy.purges[0])
+        self.assertIn('posts', proxy.purges[0])
+        self.assertEqual(fresh.headers['X-Cache'], 'MISS')
+        self.assertIn('Новый текст', fresh.text)
+
+    def test_one_batch_per_transaction(self):
+        endpoints = ['http://proxy.invalid/purge']
+        with self.settings(SURROGATE_PURGE_ENDPOINTS=endpoints), \
+                mock.patch('posts.purge.purge_keys.delay') as delay:
+            with self.assertRaises(ValueError):
+                with transaction.atomic():
+                    purge.schedule('rolled-back')
+                    raise ValueError
+            with transaction.atomic():
+                purge.schedule('b')
+                purge.schedule('a', 'b')
+            purge.schedule('c')
+        self.assertEqual(
+            [call.args for call in delay.call_args_list],
+            [(['a', 'b'],), (['c'],)],
+        )
+
+    def test_bulk_moderation_purges_proxy(self):
+        path = reverse('posts:profile', args=['author'])
+        with StubProxy(self.live_server_url) as proxy:
+            with self.settings(SURROGATE_PURGE_ENDPOINTS=[proxy.purge_url]):
+                requests.get(proxy.url + path)
+                moderation.delete_by_authors([self.author.pk])
+                call_command('run_worker', processes=0, once=True,
+                             stdout=StringIO())
+                fresh = requests.get(proxy.url + path)
+
+        self.assertEqual(len(proxy.purges), 1)
+        self.assertIn(f'post-{self.post.pk}', proxy.purges[0])
+        self.assertIn(f'group-{self.group.pk}', proxy.purges[0])
+        self.assertEqual(fresh.headers['X-Cache'], 'MISS')
+        self.assertNotIn('Тестовый пост', fresh.text)
+
+    def test_purge_drops_django_fragments(self):
+        paths = [
+            reverse('posts:index'),
+            reverse('posts:index_fragment'),
+            reverse('posts:trending'),
+        ]
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий'
+        )
+        with StubProxy(self.live_server_url) as proxy:
+            with self.settings(SURROGATE_PURGE_ENDPOINTS=[proxy.purge_url]):
+                for path in paths:
+                    self.assertIn(
+                        'Тестовый пост', requests.get(proxy.url + path).text
+                    )
+                self.post.text = 'Новый текст'
+                self.post.save()
+                call_command('run_worker', processes=0, once=True,
+                             stdout=StringIO())
+                fresh = [requests.get(proxy.url + path) for path in paths]
+
+        for path, response in zip(paths, fresh):
+            with self.subTest(path=path):
+                self.assertEqual(response.headers['X-Cache'], 'MISS')
+                self.assertIn('Новый текст', response.text)
@@ -1,22 +1,205 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME, ActionForm
+from django.contrib.auth import get_permission_codename
+from django.template.response import TemplateResponse
 
-from .models import Follow, Group, Post
+from . import archive, moderation
+from .models import ArchiveBucket, Comment, Follow, Group, Post
+from .utils import CachedCountPaginator
+
+
+class PostActionForm(ActionForm):
+    group = forms.SlugField(
+        required=False, label='Группа (slug)',
+        help_text='Пусто — убрать посты из группы',
+    )
+
+
+def move_to_group(modeladmin, request, queryset):
+    slug = request.POST.get('group')
+    group = None
+    if slug:
+        group = Group.objects.filter(slug=slug).first()
+        if group is None:
+            modeladmin.message_user(
+                request, f'Группа {slug} не найдена', messages.ERROR
+            )
+            return
+    moved = moderation.move_posts(queryset, group)
+    modeladmin.message_user(request, f'Перенесено постов: {moved}')
+
+
+move_to_group.short_description = 'Перенести в группу'
+
+
+def confirm_deletion(modeladmin, request, selected, posts, action):
+    """Подтверждение удаления, как у delete_selected; None — подтверждено.
+
+    Вместо дерева объектов страница показывает число строк по моделям:
+    пакетное удаление затрагивает тысячи постов.
+    """
+    counts, protected = moderation.deletion_summary(posts)
+    site = modeladmin.admin_site
+    perms_lacking = [
+        model._meta.verbose_name_plural
+        for model, count in counts.items()
+        if count and site.is_registered(model)
+        and not request.user.has_perm('{}.{}'.format(
+            model._meta.app_label,
+            get_permission_codename('delete', model._meta),
+        ))
+    ]
+    if request.POST.get('post') and not protected and not perms_lacking:
+        return None
+    opts = modeladmin.model._meta
+    request.current_app = site.name
+    return TemplateResponse(
+        request, 'admin/posts/post/bulk_delete_confirmation.html', {
+            **site.each_context(request),
+            'title': 'Подтвердите удаление',
+            'opts': opts,
+            'action': action,
+            'queryset': selected,
+            'model_count': [
+                (model._meta.verbose_name_plural, count)
+                for model, count in counts.items() if count
+            ],
+            'protected': protected,
+            'perms_lacking': perms_lacking,
+            'action_checkbox_name': ACTION_CHECKBOX_NAME,
+            'media': modeladmin.media,
+        }
+    )
+
+
+def bulk_delete_posts(modeladmin, request, queryset):
+    response = confirm_deletion(
+        modeladmin, request, queryset, queryset, 'bulk_delete_posts'
+    )
+    if response is not None:
+        return response
+    deleted = moderation.delete_posts(queryset)
+    modeladmin.message_user(request, f'Удалено постов: {deleted}')
+
+
+bulk_delete_posts.short_description = 'Удалить пакетно'
+bulk_delete_posts.allowed_permissions = ('delete',)
+
+
+def delete_authors_posts(modeladmin, request, queryset):
+    # Авторов фиксируем заранее: выборка тает по мере удаления.
+    authors = set(queryset.values_list('author_id', flat=True).distinct())
+    response = confirm_deletion(
+        modeladmin, request, queryset,
+        Post.objects.filter(author__in=authors), 'delete_authors_posts',
+    )
+    if response is not None:
+        return response
+    deleted = moderation.delete_by_authors(authors)
+    modeladmin.message_user(
+        request, f'Удалено постов этих авторов: {deleted}'
+    )
+
+
+delete_authors_posts.short_description = 'Удалить все посты этих авторов'
+delete_authors_posts.allowed_permissions = ('delete',)
+
+
+def bulk_delete_comments(modeladmin, request, queryset):
+    deleted = moderation.delete_comments(queryset)
+    modeladmin.message_user(request, f'Удалено комментариев: {deleted}')
+
+
+bulk_delete_comments.short_description = 'Удалить пакетно'
+
+
+class NearDuplicateFilter(admin.SimpleListFilter):
+    title = 'почти-дубликаты'
+    parameter_name = 'duplicate'
+
+    def lookups(self, request, model_admin):
+        return (('yes', 'Похожие на более ранние'),)
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(fingerprint__duplicate_of__isnull=False)
+        return queryset
+
+
+class ArchiveMonthFilter(admin.SimpleListFilter):
+    """Месяцы публикации из корзин архива вместо date_hierarchy.
+
+    date_hierarchy на каждую загрузку списка агрегирует даты по всей
+    таблице постов; корзины сайта уже хранят число постов по месяцам.
+    """
+    title = 'месяц публикации'
+    parameter_name = 'month'
+
+    def lookups(self, request, model_admin):
+        months = ArchiveBucket.objects.filter(
+            scope=ArchiveBucket.SITE, object_id=0, day=0,
+            month__gt=0, count__gt=0,
+        ).order_by('-year', '-month').values_list('year', 'month', 'count')
+        return [
+            (f'{year}-{month:02}', f'{year}-{month:02} ({count})')
+            for year, month, count in months
+        ]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            year, month = map(int, self.value().split('-'))
+            start, end = archive.date_range(year, month)
+        except ValueError:
+            return queryset.none()
+        return queryset.filter(pub_date__gte=start, pub_date__lt=end)
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group',)
-    list_editable = ('group',)
+    list_select_related = ('author', 'group',)
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', ArchiveMonthFilter, NearDuplicateFilter,)
+    autocomplete_fields = ('author', 'group',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    action_form = PostActionForm
+    actions = (move_to_group, bulk_delete_posts, delete_authors_posts,)
 
 
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('user', 'author',)
-    list_editable = ('author',)
+    list_select_related = ('user', 'author',)
+    autocomplete_fields = ('user', 'author',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
 
+class CommentAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post',)
+    list_select_related = ('author', 'post',)
+    search_fields = ('text',)
+    autocomplete_fields = ('author',)
+    raw_id_fields = ('post',)
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+    actions = (bulk_delete_comments,)
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug',)
+    search_fields = ('title', 'slug',)
+    prepopulated_fields = {'slug': ('title',)}
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+
 admin.site.register(Post, PostAdmin)
 admin.site.register(Follow, FollowAdmin)
-admin.site.register(Group)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Group, GroupAdmin)
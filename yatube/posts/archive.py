@@ -0,0 +1,154 @@
+import datetime
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import ArchiveBucket, Post
+
+
+def bucket_dates(pub_date):
+    """Ключи (year, month, day) корзин года, месяца и дня публикации."""
+    date = timezone.localtime(pub_date).date()
+    return [
+        (date.year, 0, 0),
+        (date.year, date.month, 0),
+        (date.year, date.month, date.day),
+    ]
+
+
+def post_scopes(author_id, group_id):
+    scopes = [(ArchiveBucket.SITE, 0), (ArchiveBucket.AUTHOR, author_id)]
+    if group_id is not None:
+        scopes.append((ArchiveBucket.GROUP, group_id))
+    return scopes
+
+
+def change(pub_date, scopes, delta):
+    """Сдвигает счётчики всех корзин поста на delta."""
+    keys = [
+        (scope, object_id, *date)
+        for scope, object_id in scopes
+        for date in bucket_dates(pub_date)
+    ]
+    lookup = Q()
+    for scope, object_id, year, month, day in keys:
+        lookup |= Q(
+            scope=scope, object_id=object_id, year=year, month=month, day=day
+        )
+    buckets = ArchiveBucket.objects.filter(lookup)
+    if buckets.update(count=F('count') + delta) == len(keys) or delta < 0:
+        return
+    existing = set(buckets.values_list(
+        'scope', 'object_id', 'year', 'month', 'day'
+    ))
+    for scope, object_id, year, month, day in set(keys) - existing:
+        try:
+            with transaction.atomic():
+                ArchiveBucket.objects.create(
+                    scope=scope, object_id=object_id,
+                    year=year, month=month, day=day, count=delta,
+                )
+        except IntegrityError:
+            ArchiveBucket.objects.filter(
+                scope=scope, object_id=object_id,
+                year=year, month=month, day=day,
+            ).update(count=F('count') + delta)
+
+
+def post_deltas(rows, delta):
+    """Счётчик сдвигов корзин для строк (pub_date, author_id, group_id)."""
+    deltas = Counter()
+    for pub_date, author_id, group_id in rows:
+        for scope in post_scopes(author_id, group_id):
+            for date in bucket_dates(pub_date):
+                deltas[(*scope, *date)] += delta
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Применяет накопленные сдвиги: по одному UPDATE на корзину."""
+    for (scope, object_id, year, month, day), delta in deltas.items():
+        if not delta:
+            continue
+        bucket = ArchiveBucket.objects.filter(
+            scope=scope, object_id=object_id, year=year, month=month, day=day
+        )
+        if not bucket.update(count=F('count') + delta) and delta > 0:
+            ArchiveBucket.objects.create(
+                scope=scope, object_id=object_id,
+                year=year, month=month, day=day, count=delta,
+            )
+
+
+def rebuild():
+    """Пересчитывает все корзины одним проходом по постам."""
+    counts = post_deltas(
+        Post.objects.values_list(
+            'pub_date', 'author_id', 'group_id'
+        ).iterator(),
+        1,
+    )
+    with transaction.atomic():
+        ArchiveBucket.objects.all().delete()
+        ArchiveBucket.objects.bulk_create(
+            (
+                ArchiveBucket(
+                    scope=scope, object_id=object_id,
+                    year=year, month=month, day=day, count=count,
+                )
+                for (scope, object_id, year, month, day), count
+                in counts.items()
+            ),
+            batch_size=1000,
+        )
+
+
+def total(scope, object_id):
+    """Всего постов в области по годовым корзинам, без COUNT(*)."""
+    return ArchiveBucket.objects.filter(
+        scope=scope, object_id=object_id, month=0
+    ).aggregate(total=Sum('count'))['total'] or 0
+
+
+def date_range(year, month=None, day=None):
+    """Границы [start, end) периода в текущей временной зоне.
+
+    Бросает ValueError для несуществующей даты.
+    """
+    start = datetime.date(year, month or 1, day or 1)
+    if day:
+        end = start + datetime.timedelta(days=1)
+    elif month:
+        end = (start + datetime.timedelta(days=31)).replace(day=1)
+    else:
+        end = start.replace(year=year + 1)
+    return tuple(
+        timezone.make_aware(datetime.datetime.combine(date, datetime.time()))
+        for date in (start, end)
+    )
+
+
+def navigation(scope, object_id, year, month=None):
+    """Годы, месяцы выбранного года и дни выбранного месяца с числом постов.
+
+    Один запрос к таблице корзин, без агрегатов по постам.
+    """
+    lookup = Q(month=0) | Q(year=year, day=0)
+    if month:
+        lookup |= Q(year=year, month=month)
+    buckets = ArchiveBucket.objects.filter(
+        lookup, scope=scope, object_id=object_id, count__gt=0
+    ).values_list('year', 'month', 'day', 'count')
+    nav = {'years': [], 'months': [], 'days': []}
+    for bucket_year, bucket_month, bucket_day, count in buckets:
+        if not bucket_month:
+            nav['years'].append(((bucket_year,), count))
+        elif not bucket_day:
+            nav['months'].append(((bucket_year, bucket_month), count))
+        else:
+            nav['days'].append(
+                ((bucket_year, bucket_month, bucket_day), count)
+            )
+    return nav
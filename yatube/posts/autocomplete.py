@@ -0,0 +1,407 @@
+import heapq
+import sys
+import threading
+from array import array
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from .models import Group, User
+
+USER: int = 0
+GROUP: int = 1
+MAX_RESULTS: int = 10
+MAX_QUERY_LENGTH: int = 100
+# Столько изменений копится сбоку, прежде чем основа пересобирается.
+COMPACT_THRESHOLD: int = 10000
+# Цель по памяти: миллион пользователей (около трёх ключей на каждого)
+# укладывается в 64 байта на ключ, то есть меньше 200 МБ.
+BYTES_PER_KEY_TARGET: int = 64
+SEPARATOR = '\0'
+# Разделяет поля подписи: имя и полное имя, название группы и slug.
+FIELD_SEPARATOR = '\x1f'
+# Журнал изменений в кеше: по нему процессы догоняют друг друга.
+VERSION_KEY = 'autocomplete:version'
+CHANGE_TIMEOUT: int = 60 * 60 * 24
+# Отставание больше этого дешевле пересобрать, чем доиграть.
+MAX_REPLAY: int = 1000
+
+
+def ref(kind, pk):
+    return pk * 2 + kind
+
+
+def unref(value):
+    return value % 2, value // 2
+
+
+def normalize(text):
+    return text.casefold().replace(SEPARATOR, '')
+
+
+def phrase_keys(text):
+    """Ключи фразы: она целиком и с начала каждого следующего слова."""
+    words = normalize(text).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+def user_keys(username, first_name, last_name):
+    return {normalize(username)} | phrase_keys(f'{first_name} {last_name}')
+
+
+def group_keys(title, slug):
+    return {normalize(slug)} | phrase_keys(title)
+
+
+def user_display(username, first_name, last_name):
+    return username, f'{first_name} {last_name}'.strip()
+
+
+def group_display(title, slug):
+    return title, slug
+
+
+def pack(display):
+    return FIELD_SEPARATOR.join(
+        field.replace(FIELD_SEPARATOR, '').replace(SEPARATOR, '')
+        for field in display
+    )
+
+
+class PackedKeys:
+    """Отсортированные ключи одной строкой с массивом смещений.
+
+    Вместо миллионов отдельных str — одна строка и по 4 байта
+    на ключ; bisect работает через __getitem__.
+    """
+
+    def __init__(self, keys):
+        self.offsets = array('I', [0])
+        for key in keys:
+            self.offsets.append(self.offsets[-1] + len(key) + 1)
+        self.text = SEPARATOR.join(keys) + SEPARATOR if keys else ''
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.text[self.offsets[index]:self.offsets[index + 1] - 1]
+
+
+class PrefixIndex:
+    """Префиксный индекс: упакованная основа и маленький список изменений.
+
+    Изменения из сигналов вставляются в отсортированный delta, а ссылки
+    с изменёнными ключами попадают в replaced и в основе пропускаются.
+    Когда изменений накапливается много, основа пересобирается.
+
+    Рядом с ключами лежат подписи ссылок — то, что показывают
+    подсказки, — поэтому поиск обходится без базы.
+    """
+
+    def __init__(self, entries=(), names=()):
+        self.lock = threading.Lock()
+        # Номер последнего изменения журнала, учтённого в индексе.
+        self.version = 0
+        self.build(entries, names)
+
+    def build(self, entries, names):
+        entries = sorted(set(entries))
+        names = sorted(dict(names).items())
+        # Ключи и ссылки подменяются вместе: поиск не увидит их вразнобой.
+        self.base = (
+            PackedKeys([key for key, _ in entries]),
+            array('I', [value for _, value in entries]),
+            array('I', [value for value, _ in names]),
+            PackedKeys([pack(display) for _, display in names]),
+        )
+        self.delta = []
+        self.delta_names = {}
+        self.replaced = set()
+
+    def entries(self):
+        keys, refs, *_ = self.base
+        base = (
+            (keys[i], refs[i]) for i in range(len(refs))
+            if refs[i] not in self.replaced
+        )
+        return heapq.merge(base, self.delta)
+
+    def names(self):
+        _, _, refs, displays = self.base
+        for i in range(len(refs)):
+            if refs[i] not in self.replaced:
+                yield refs[i], tuple(displays[i].split(FIELD_SEPARATOR))
+        for value, display in self.delta_names.items():
+            if display is not None:
+                yield value, display
+
+    def display(self, value):
+        """Подпись ссылки value; None, если её нет в индексе."""
+        if value in self.replaced:
+            return self.delta_names.get(value)
+        _, _, refs, displays = self.base
+        index = bisect_left(refs, value)
+        if index < len(refs) and refs[index] == value:
+            return tuple(displays[index].split(FIELD_SEPARATOR))
+        return None
+
+    def update(self, value, keys, display=None):
+        with self.lock:
+            # Подпись раньше replaced: поиск не увидит ссылку без неё.
+            self.delta_names[value] = display if keys else None
+            self.replaced.add(value)
+            delta = [entry for entry in self.delta if entry[1] != value]
+            for key in keys:
+                insort(delta, (key, value))
+            self.delta = delta
+            if len(delta) + len(self.replaced) > COMPACT_THRESHOLD:
+                self.build(list(self.entries()), list(self.names()))
+
+    def remove(self, value):
+        self.update(value, ())
+
+    def base_matches(self, prefix):
+        keys, refs, *_ = self.base
+        index = bisect_left(keys, prefix)
+        while index < len(refs):
+            key = keys[index]
+            if not key.startswith(prefix):
+                return
+            if refs[index] not in self.replaced:
+                yield key, refs[index]
+            index += 1
+
+    def delta_matches(self, prefix):
+        index = bisect_left(self.delta, (prefix,))
+        for key, value in self.delta[index:]:
+            if not key.startswith(prefix):
+                return
+            yield key, value
+
+    def search(self, prefix, limit=MAX_RESULTS):
+        """Ссылки с ключами на prefix по алфавиту ключей, без повторов."""
+        prefix = normalize(prefix)
+        found = []
+        if not prefix:
+            return found
+        for _, value in heapq.merge(
+            self.base_matches(prefix), self.delta_matches(prefix)
+        ):
+            if value not in found:
+                found.append(value)
+                if len(found) == limit:
+                    break
+        return found
+
+    def __len__(self):
+        return len(self.base[1])
+
+    def memory(self):
+        """Байты основы: строки ключей и подписей с их массивами."""
+        keys, refs, name_refs, displays = self.base
+        return sum(map(sys.getsizeof, (
+            keys.text, keys.offsets, refs,
+            name_refs, displays.text, displays.offsets,
+        )))
+
+
+def load_entries():
+    users = User.objects.values_list(
+        'pk', 'username', 'first_name', 'last_name'
+    ).iterator()
+    for pk, *names in users:
+        for key in user_keys(*names):
+            yield key, ref(USER, pk)
+    for pk, title, slug in Group.objects.values_list('pk', 'title', 'slug'):
+        for key in group_keys(title, slug):
+            yield key, ref(GROUP, pk)
+
+
+def load_names():
+    users = User.objects.values_list(
+        'pk', 'username', 'first_name', 'last_name'
+    ).iterator()
+    for pk, *names in users:
+        yield ref(USER, pk), user_display(*names)
+    for pk, title, slug in Group.objects.values_list('pk', 'title', 'slug'):
+        yield ref(GROUP, pk), group_display(title, slug)
+
+
+def change_key(version):
+    return f'autocomplete:change:{version}'
+
+
+def log_change(value):
+    """Записывает изменение ссылки value в общий журнал процессов."""
+    try:
+        version = cache.incr(VERSION_KEY)
+    except ValueError:
+        if cache.add(VERSION_KEY, 1, None):
+            version = 1
+        else:
+            version = cache.incr(VERSION_KEY)
+    cache.set(change_key(version), value, CHANGE_TIMEOUT)
+
+
+def replay(index, values):
+    """Перечитывает из базы ключи ссылок values; пропавшие удаляет."""
+    found = {}
+    ids = {USER: set(), GROUP: set()}
+    for kind, pk in map(unref, values):
+        ids[kind].add(pk)
+    users = User.objects.filter(pk__in=ids[USER]).values_list(
+        'pk', 'username', 'first_name', 'last_name'
+    )
+    for pk, *names in users:
+        found[ref(USER, pk)] = user_keys(*names), user_display(*names)
+    groups = Group.objects.filter(pk__in=ids[GROUP]).values_list(
+        'pk', 'title', 'slug'
+    )
+    for pk, *names in groups:
+        found[ref(GROUP, pk)] = group_keys(*names), group_display(*names)
+    for value in set(values):
+        index.update(value, *found.get(value, ((), None)))
+
+
+_index = None
+_lock = threading.Lock()
+# Изменения, пришедшие, пока индекс собирается: их применят к новому.
+_building = False
+_pending = []
+_pending_lock = threading.Lock()
+
+
+def build():
+    """Собирает индекс заново и подменяет им текущий.
+
+    Версия журнала берётся до чтения базы: всё, что изменится во время
+    сборки, потом доиграется по журналу или из _pending.
+    """
+    global _index, _building
+    with _pending_lock:
+        _building = True
+    try:
+        version = cache.get(VERSION_KEY, 0)
+        index = PrefixIndex(load_entries(), load_names())
+        index.version = version
+        with _pending_lock:
+            for value, keys, display in _pending:
+                index.update(value, keys, display)
+            _index = index
+    finally:
+        with _pending_lock:
+            _building = False
+            _pending.clear()
+    return index
+
+
+def rebuild():
+    """Пересборка в фоне; пока она идёт, ищет старый индекс."""
+    if _lock.acquire(blocking=False):
+        try:
+            build()
+        finally:
+            _lock.release()
+
+
+def sync(index):
+    """Догоняет изменения других процессов по журналу в кеше.
+
+    Если журнал обнулился или его часть вытеснена из кеша, доиграть
+    нельзя — индекс пересобирается.
+    """
+    version = cache.get(VERSION_KEY, 0)
+    if version == index.version:
+        return
+    keys = [
+        change_key(number)
+        for number in range(index.version + 1, version + 1)
+    ]
+    changes = cache.get_many(keys) if len(keys) <= MAX_REPLAY else {}
+    if version < index.version or len(changes) < len(keys):
+        if not _lock.locked():
+            threading.Thread(target=rebuild, daemon=True).start()
+        return
+    replay(index, list(changes.values()))
+    index.version = max(index.version, version)
+
+
+def get_index():
+    """Индекс процесса, сверенный с журналом; строится при первом вызове."""
+    index = _index
+    if index is None:
+        with _lock:
+            index = _index if _index is not None else build()
+    sync(index)
+    return index
+
+
+def start():
+    """Строит индекс в фоне при старте сервера, не задерживая запуск."""
+    threading.Thread(target=get_index, daemon=True).start()
+
+
+def reset():
+    global _index
+    _index = None
+
+
+def apply(value, keys, display=None):
+    """Применяет изменение к индексу процесса и публикует его остальным."""
+    with _pending_lock:
+        if _building:
+            _pending.append((value, keys, display))
+        index = _index
+    if index is not None:
+        index.update(value, keys, display)
+    transaction.on_commit(lambda: log_change(value))
+
+
+def user_changed(user, deleted=False):
+    names = user.username, user.first_name, user.last_name
+    if deleted:
+        apply(ref(USER, user.pk), ())
+    else:
+        apply(ref(USER, user.pk), user_keys(*names), user_display(*names))
+
+
+def group_changed(group, deleted=False):
+    names = group.title, group.slug
+    if deleted:
+        apply(ref(GROUP, group.pk), ())
+    else:
+        apply(ref(GROUP, group.pk), group_keys(*names), group_display(*names))
+
+
+def suggest(prefix, limit=MAX_RESULTS):
+    """Подсказки для prefix: пользователи и группы с адресами страниц.
+
+    Всё берётся из индекса процесса, без запросов к базе.
+    """
+    index = get_index()
+    results = []
+    for value in index.search(prefix, limit):
+        display = index.display(value)
+        if display is None:
+            continue
+        kind, _ = unref(value)
+        if kind == USER:
+            username, full_name = display
+            results.append({
+                'type': 'user',
+                'label': full_name or username,
+                'username': username,
+                'url': reverse('posts:profile', args=[username]),
+            })
+        else:
+            title, slug = display
+            results.append({
+                'type': 'group',
+                'label': title,
+                'slug': slug,
+                'url': reverse('posts:group_posts', args=[slug]),
+            })
+    return results
@@ -0,0 +1,203 @@
+import atexit
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+
+from . import trending
+from .models import Post
+
+# Фоновый поток раз в SPILL_INTERVAL переносит просмотры процесса в кеш
+# и раз в FLUSH_INTERVAL пишет накопленное в базу пачкой.
+SPILL_INTERVAL: float = 1.0
+FLUSH_INTERVAL: float = 10.0
+PENDING_TIMEOUT: int = 60 * 60 * 24
+# Сбрасывает в базу один процесс за раз: только он вычитает из кеша.
+FLUSH_LOCK_KEY = 'views:flush-lock'
+FLUSH_LOCK_TIMEOUT: int = 60
+
+
+def pending_key(post_id):
+    return f'views:pending:{post_id}'
+
+
+def add_pending(post_id, count):
+    key = pending_key(post_id)
+    try:
+        cache.incr(key, count)
+    except ValueError:
+        if not cache.add(key, count, PENDING_TIMEOUT):
+            cache.incr(key, count)
+
+
+class ViewBuffer:
+    """Буфер просмотров с записью в базу отложенно и пачками.
+
+    Первый уровень — Counter в памяти процесса: просмотр стоит одного
+    сложения под блокировкой. Второй — счётчики в кеше, а dirty помнит,
+    какие из них процесс должен слить в базу. Оба уровня разгружает
+    фоновый поток (start), поэтому процесс без новых просмотров всё
+    равно дописывает накопленное.
+
+    Что теряется при падении процесса, зависит от кеша. Его Counter —
+    до SPILL_INTERVAL просмотров. С общим кешем (memcached, Redis)
+    перенесённое в кеш остаётся там и уходит в базу при сбросе того же
+    поста другим процессом, а без него истекает через PENDING_TIMEOUT.
+    С LocMemCache кеш живёт в процессе, и теряется всё не записанное
+    в базу, то есть до FLUSH_INTERVAL просмотров.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = Counter()
+        self.dirty = set()
+        self.flushed_at = time.monotonic()
+        self.thread = None
+
+    def record(self, post_id, count=1):
+        with self.lock:
+            self.local[post_id] += count
+
+    def pending(self, post_id):
+        """Просмотры, ещё не записанные в базу: в процессе и в кеше."""
+        with self.lock:
+            local = self.local[post_id]
+        return local + (cache.get(pending_key(post_id)) or 0)
+
+    def spill(self):
+        with self.lock:
+            local, self.local = self.local, Counter()
+            self.dirty.update(local)
+        for post_id, count in local.items():
+            add_pending(post_id, count)
+
+    def take(self, dirty):
+        """Вычитает из кеша счётчики dirty и возвращает вычтенное.
+
+        Вызывается только под FLUSH_LOCK_KEY: кроме этого процесса из
+        кеша сейчас никто не вычитает, а прибавленное между чтением
+        и decr остаётся в кеше до следующего сброса.
+        """
+        keys = {pending_key(post_id): post_id for post_id in dirty}
+        taken = {}
+        for key, count in cache.get_many(keys).items():
+            if count <= 0:
+                continue
+            try:
+                cache.decr(key, count)
+            except ValueError:
+                # Ключ истёк между чтением и вычитанием.
+                continue
+            taken[keys[key]] = count
+        return taken
+
+    def flush(self):
+        """Переносит накопленное в базу: один UPDATE на каждое приращение.
+
+        При ошибке базы приращения возвращаются в кеш и уйдут следующим
+        сбросом. Если сейчас сбрасывает другой процесс, dirty ждёт.
+        """
+        self.spill()
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            self.flushed_at = time.monotonic()
+        if not dirty:
+            return 0
+        token = uuid.uuid4().hex
+        if not cache.add(FLUSH_LOCK_KEY, token, FLUSH_LOCK_TIMEOUT):
+            with self.lock:
+                self.dirty.update(dirty)
+            return 0
+        try:
+            return self.write(self.take(dirty))
+        finally:
+            if cache.get(FLUSH_LOCK_KEY) == token:
+                cache.delete(FLUSH_LOCK_KEY)
+
+    def write(self, taken):
+        if not taken:
+            return 0
+        try:
+            with transaction.atomic():
+                # Просмотры удалённых постов просто отбрасываются.
+                existing = set(Post.objects.filter(
+                    pk__in=taken
+                ).values_list('pk', flat=True))
+                written = {
+                    post_id: count for post_id, count in taken.items()
+                    if post_id in existing
+                }
+                by_count = defaultdict(list)
+                for post_id, count in written.items():
+                    by_count[count].append(post_id)
+                for count, ids in by_count.items():
+                    Post.objects.filter(pk__in=ids).update(
+                        views=F('views') + count
+                    )
+                if written:
+                    trending.record_many(written)
+        except DatabaseError:
+            for post_id, count in taken.items():
+                add_pending(post_id, count)
+            with self.lock:
+                self.dirty.update(taken)
+            raise
+        return sum(written.values())
+
+    def tick(self):
+        """Шаг фонового потока: перенос в кеш или, когда пора, в базу."""
+        if time.monotonic() - self.flushed_at >= FLUSH_INTERVAL:
+            try:
+                self.flush()
+            except DatabaseError:
+                # Приращения уже вернулись в кеш: повторит следующий сброс.
+                pass
+        else:
+            self.spill()
+
+    def run(self):
+        while True:
+            time.sleep(SPILL_INTERVAL)
+            try:
+                self.tick()
+            except Exception:
+                traceback.print_exc()
+            finally:
+                close_old_connections()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+
+buffer = ViewBuffer()
+
+
+def shutdown():
+    """При остановке процесса дописывает его просмотры в базу."""
+    try:
+        buffer.flush()
+    except DatabaseError:
+        pass
+
+
+def start():
+    """Запускает фоновый сброс; вызывается при старте сервера."""
+    if buffer.thread is None:
+        buffer.start()
+        atexit.register(shutdown)
+
+
+def record_view(post_id):
+    buffer.record(post_id)
+
+
+def views(post):
+    """Число просмотров поста вместе с ещё не записанными в базу."""
+    return post.views + buffer.pending(post.pk)
@@ -0,0 +1,143 @@
+import hashlib
+import re
+
+from django.db.models import Q
+
+from .models import FingerprintBand, PostFingerprint
+
+SHINGLE: int = 4
+BANDS: int = 8
+ROWS: int = 4
+NUM_HASHES: int = BANDS * ROWS
+# Столько позиций подписи могут различаться у почти-дубликатов
+# (сходство по Жаккару от 0.69). Пост с другим текстом отличается в 25+.
+MAX_DISTANCE: int = 10
+# Короче этого числа n-грамм тексты не сравниваются: «Спасибо!» у многих
+# авторов совпадает, но дубликатом не считается.
+MIN_SHINGLES: int = 16
+# Столько кандидатов из совпавших полос проверяется, не больше:
+# большой кластер спама не должен делать запись поста медленнее.
+MAX_CANDIDATES: int = 20
+PRIME: int = (1 << 31) - 1
+SEED: int = 20240101
+WORD_RE = re.compile(r'\w+')
+
+_coefficients = None
+
+
+def coefficients():
+    """Параметры хеш-функций (a * x + b) mod PRIME, одни на все процессы."""
+    global _coefficients
+    if _coefficients is None:
+        import numpy as np
+
+        random = np.random.RandomState(SEED)
+        _coefficients = (
+            random.randint(1, PRIME, NUM_HASHES).astype(np.uint64),
+            random.randint(0, PRIME, NUM_HASHES).astype(np.uint64),
+        )
+    return _coefficients
+
+
+def shingles(text):
+    """Множество символьных n-грамм текста без регистра и пунктуации."""
+    text = ' '.join(WORD_RE.findall(text.casefold()))
+    return {
+        text[i:i + SHINGLE] for i in range(max(len(text) - SHINGLE + 1, 1))
+    }
+
+
+def signature(text):
+    """MinHash-подпись текста: NUM_HASHES минимумов в массиве uint32.
+
+    Для текстов короче MIN_SHINGLES n-грамм — None.
+    """
+    import numpy as np
+
+    text_shingles = shingles(text)
+    if len(text_shingles) < MIN_SHINGLES:
+        return None
+    a, b = coefficients()
+    hashes = np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode(), digest_size=4).digest(),
+                'little',
+            )
+            for shingle in text_shingles
+        ),
+        dtype=np.uint64,
+    )
+    return ((np.outer(a, hashes) + b[:, None]) % PRIME).min(axis=1).astype(
+        np.uint32
+    )
+
+
+def to_bytes(sig):
+    return sig.astype('<u4').tobytes()
+
+
+def from_bytes(data):
+    import numpy as np
+
+    return np.frombuffer(bytes(data), dtype='<u4')
+
+
+def band_values(sig):
+    """Ключ LSH каждой полосы: хеш её ROWS минимумов в int64."""
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                to_bytes(sig[band * ROWS:(band + 1) * ROWS]), digest_size=8
+            ).digest(),
+            'little',
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def distance(left, right):
+    return int((left != right).sum())
+
+
+def find_duplicate(sig, exclude=None):
+    """Самый ранний пост, чья подпись отличается не больше MAX_DISTANCE.
+
+    Кандидаты — первые MAX_CANDIDATES постов, совпавших хотя бы в одной
+    полосе: один запрос по индексу (band, value), затем проверка
+    подписей в памяти. Без подписи (короткий текст) дубликатов нет.
+    """
+    if sig is None:
+        return None
+    query = Q()
+    for band, value in enumerate(band_values(sig)):
+        query |= Q(bands__band=band, bands__value=value)
+    candidates = PostFingerprint.objects.filter(query).exclude(
+        post_id=exclude
+    ).distinct().order_by('post_id').values_list(
+        'post_id', 'signature'
+    )[:MAX_CANDIDATES]
+    for post_id, data in candidates:
+        if distance(sig, from_bytes(data)) <= MAX_DISTANCE:
+            return post_id
+    return None
+
+
+def fingerprint(post):
+    """Сохраняет подпись и полосы поста и отмечает, на что он похож."""
+    sig = signature(post.text)
+    if sig is None:
+        PostFingerprint.objects.filter(post=post).delete()
+        return None
+    duplicate_of = find_duplicate(sig, exclude=post.pk)
+    PostFingerprint.objects.update_or_create(post=post, defaults={
+        'signature': to_bytes(sig),
+        'duplicate_of_id': duplicate_of,
+    })
+    FingerprintBand.objects.filter(fingerprint_id=post.pk).delete()
+    FingerprintBand.objects.bulk_create(
+        FingerprintBand(fingerprint_id=post.pk, band=band, value=value)
+        for band, value in enumerate(band_values(sig))
+    )
+    return duplicate_of
@@ -0,0 +1,38 @@
+from django.core.cache import cache
+
+from .models import Follow
+
+FOLLOWING_TIMEOUT: int = 60 * 60 * 24
+
+
+def following_key(user_id):
+    return f'following:{user_id}'
+
+
+def following_ids(user):
+    """Множество id авторов, на которых подписан user, из кеша."""
+    if not user.is_authenticated:
+        return frozenset()
+    key = following_key(user.pk)
+    ids = cache.get(key)
+    if ids is None:
+        ids = set(
+            Follow.objects.filter(user=user).values_list(
+                'author_id', flat=True
+            )
+        )
+        cache.set(key, ids, FOLLOWING_TIMEOUT)
+    return ids
+
+
+def update_following(user_id, author_id, followed):
+    """Правит закешированное множество на месте, не перечитывая его."""
+    key = following_key(user_id)
+    ids = cache.get(key)
+    if ids is None:
+        return
+    if followed:
+        ids.add(author_id)
+    else:
+        ids.discard(author_id)
+    cache.set(key, ids, FOLLOWING_TIMEOUT)
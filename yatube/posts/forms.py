@@ -1,5 +1,7 @@
 from django import forms
+from django.conf import settings
 
+from . import duplicates
 from .models import Comment, Post
 
 
@@ -8,6 +10,17 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_text(self):
+        text = self.cleaned_data['text']
+        if settings.NEAR_DUPLICATE_ACTION != 'reject':
+            return text
+        duplicate = duplicates.find_duplicate(
+            duplicates.signature(text), exclude=self.instance.pk
+        )
+        if duplicate is not None:
+            raise forms.ValidationError('Почти такой же пост уже опубликован')
+        return text
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,78 @@
+import re
+
+from .models import Mention, PostTag, Tag, User
+
+TAG_LENGTH: int = 50
+USERNAME_LENGTH: int = 150
+TAG_RE = re.compile(r'(?<!\w)#(\w+)')
+MENTION_RE = re.compile(r'(?<!\w)@(\w(?:[\w.+-]*[\w+-])?)')
+TOKEN_RE = re.compile(f'{TAG_RE.pattern}|{MENTION_RE.pattern}')
+
+
+def normalize(tag):
+    return tag.casefold()
+
+
+def parse(text):
+    """Множества тегов (в нижнем регистре) и упомянутых имён из текста."""
+    tags = {
+        normalize(tag) for tag in TAG_RE.findall(text)
+        if len(tag) <= TAG_LENGTH
+    }
+    usernames = {
+        name for name in MENTION_RE.findall(text)
+        if len(name) <= USERNAME_LENGTH
+    }
+    return tags, usernames
+
+
+def tag_ids(names):
+    """id тегов по именам; недостающие создаются одним INSERT."""
+    ids = dict(Tag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = set(names) - ids.keys()
+    if missing:
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing], ignore_conflicts=True
+        )
+        ids.update(Tag.objects.filter(name__in=missing).values_list(
+            'name', 'pk'
+        ))
+    return ids
+
+
+def index_posts(posts):
+    """Добавляет в индекс теги и упоминания постов пачкой.
+
+    posts — строки (pk, author_id, text). На всю пачку уходит по
+    запросу на теги, пользователей и каждую из двух таблиц индекса.
+    Упоминание себя уведомлением не считается.
+    """
+    parsed = [
+        (pk, author_id, *parse(text)) for pk, author_id, text in posts
+    ]
+    tags = tag_ids({tag for _, _, tags, _ in parsed for tag in tags})
+    users = dict(User.objects.filter(username__in={
+        name for *_, usernames in parsed for name in usernames
+    }).values_list('username', 'pk'))
+    PostTag.objects.bulk_create([
+        PostTag(post_id=pk, tag_id=tags[tag])
+        for pk, _, post_tags, _ in parsed for tag in post_tags
+    ], ignore_conflicts=True)
+    Mention.objects.bulk_create([
+        Mention(post_id=pk, user_id=users[name])
+        for pk, author_id, _, usernames in parsed for name in usernames
+        if users.get(name, author_id) != author_id
+    ], ignore_conflicts=True)
+
+
+def reindex_post(post, created=False):
+    """Приводит индекс поста к его текущему тексту."""
+    if not created:
+        tags, usernames = parse(post.text)
+        PostTag.objects.filter(post=post).exclude(
+            tag__name__in=tags
+        ).delete()
+        Mention.objects.filter(post=post).exclude(
+            user__username__in=usernames
+        ).delete()
+    index_posts([(post.pk, post.author_id, post.text)])
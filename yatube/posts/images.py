@@ -0,0 +1,47 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Post, StoredImage
+
+
+def retain(name):
+    """Добавляет ссылку на файл картинки."""
+    if StoredImage.objects.filter(name=name).update(refs=F('refs') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredImage.objects.create(name=name, refs=1)
+    except IntegrityError:
+        StoredImage.objects.filter(name=name).update(refs=F('refs') + 1)
+
+
+def release(names):
+    """Снимает ссылки; файлы без ссылок удаляются после коммита.
+
+    Вместе с файлом уходят его миниатюры и записи kvstore sorl.
+    """
+    for name, count in Counter(names).items():
+        StoredImage.objects.filter(name=name).update(refs=F('refs') - count)
+    unused = list(StoredImage.objects.filter(
+        name__in=set(names), refs__lte=0
+    ).values_list('name', flat=True))
+    if not unused:
+        return
+    StoredImage.objects.filter(name__in=unused, refs__lte=0).delete()
+    transaction.on_commit(lambda: delete_files(unused))
+
+
+def delete_files(names):
+    from sorl.thumbnail import delete
+    from sorl.thumbnail.images import ImageFile
+
+    # Пока ждали коммита, ту же картинку могли загрузить заново.
+    reused = set(StoredImage.objects.filter(
+        name__in=names
+    ).values_list('name', flat=True))
+    storage = Post._meta.get_field('image').storage
+    for name in names:
+        if name not in reused:
+            delete(ImageFile(name, storage))
@@ -0,0 +1,122 @@
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import duplicates
+from posts.moderation import CHUNK_SIZE, chunks
+from posts.models import FingerprintBand, Post, PostFingerprint
+
+WINDOW: int = 32
+
+
+def backfill(progress=None):
+    """Считает подписи постов, у которых их ещё нет, порциями.
+
+    Короткие тексты подписи не получают и просто пропускаются.
+    """
+    done = 0
+    for ids in chunks(Post.objects.filter(fingerprint__isnull=True)):
+        rows = Post.objects.filter(pk__in=ids).values_list('pk', 'text')
+        fingerprints, bands = [], []
+        for pk, text in rows:
+            sig = duplicates.signature(text)
+            if sig is None:
+                continue
+            fingerprints.append(PostFingerprint(
+                post_id=pk, signature=duplicates.to_bytes(sig)
+            ))
+            bands.extend(
+                FingerprintBand(fingerprint_id=pk, band=band, value=value)
+                for band, value in enumerate(duplicates.band_values(sig))
+            )
+        with transaction.atomic():
+            PostFingerprint.objects.bulk_create(fingerprints)
+            FingerprintBand.objects.bulk_create(bands, batch_size=CHUNK_SIZE)
+        done += len(ids)
+        if progress:
+            progress(done)
+    return done
+
+
+def load():
+    rows = PostFingerprint.objects.order_by('post_id').values_list(
+        'post_id', 'signature'
+    )
+    ids, signatures = [], []
+    for post_id, data in rows.iterator():
+        ids.append(post_id)
+        signatures.append(duplicates.from_bytes(data))
+    if not ids:
+        return np.zeros(0, np.int64), np.zeros((0, duplicates.NUM_HASHES))
+    return np.array(ids), np.vstack(signatures)
+
+
+def similar_pairs(signatures, window=WINDOW):
+    """Пары строк, совпавших в полосе и близких по Хэммингу.
+
+    В каждой полосе строки сортируются по её значениям, и каждая
+    сравнивается с window следующими — сразу для всех строк.
+    """
+    found = [np.zeros((0, 2), np.int64)]
+    if len(signatures) < 2:
+        return found[0]
+    for band in range(duplicates.BANDS):
+        columns = signatures[
+            :, band * duplicates.ROWS:(band + 1) * duplicates.ROWS
+        ]
+        _, groups = np.unique(columns, axis=0, return_inverse=True)
+        groups = groups.ravel()
+        order = np.argsort(groups, kind='stable')
+        for offset in range(1, min(window, len(order) - 1) + 1):
+            left, right = order[:-offset], order[offset:]
+            same = groups[left] == groups[right]
+            left, right = left[same], right[same]
+            distance = (signatures[left] != signatures[right]).sum(axis=1)
+            close = distance <= duplicates.MAX_DISTANCE
+            found.append(np.stack([left[close], right[close]], axis=1))
+    return np.unique(np.vstack(found), axis=0)
+
+
+def clusters(size, pairs):
+    """Компоненты связности пар (система непересекающихся множеств)."""
+    parent = list(range(size))
+
+    def root(item):
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    for left, right in pairs.tolist():
+        parent[root(left)] = root(right)
+    members = {}
+    for item in np.unique(pairs).tolist():
+        members.setdefault(root(item), []).append(item)
+    return sorted(
+        (sorted(group) for group in members.values()), key=lambda g: g[0]
+    )
+
+
+class Command(BaseCommand):
+    help = 'Находит группы почти одинаковых постов по MinHash-подписям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--window', type=int, default=WINDOW)
+        parser.add_argument('--flag', action='store_true',
+                            help='отметить посты группы как дубликаты '
+                                 'самого раннего')
+
+    def handle(self, *args, **options):
+        backfill(lambda done: self.stdout.write(f'Подписано постов: {done}'))
+        ids, signatures = load()
+        groups = clusters(len(ids), similar_pairs(
+            signatures, options['window']
+        ))
+        for group in groups:
+            post_ids = ids[group].tolist()
+            self.stdout.write(' '.join(map(str, post_ids)))
+            if options['flag']:
+                PostFingerprint.objects.filter(
+                    post_id__in=post_ids[1:]
+                ).update(duplicate_of_id=post_ids[0])
+        self.stdout.write(f'Групп почти-дубликатов: {len(groups)}')
@@ -0,0 +1,108 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import recent
+from posts.models import Follow, Post, User
+from posts.utils import MAX_POSTS_ON_PAGE
+
+PREFIX = 'feedbench'
+
+
+def timed(function, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        times.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(times)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает первую страницу ленты подписок: JOIN по Follow '
+            'и слияние списков последних постов авторов')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=30,
+                            help='постов на автора')
+        parser.add_argument('--follows', default='1,5,20,50,150',
+                            help='числа подписок читателей через запятую')
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        User.objects.bulk_create(
+            User(username=f'{PREFIX}{i}') for i in range(options['authors'])
+        )
+        authors = list(User.objects.filter(
+            username__startswith=PREFIX
+        ).values_list('pk', flat=True))
+        # Активность авторов неравномерна: у немногих большая часть постов.
+        weights = [1 / (rank + 1) for rank in range(len(authors))]
+        Post.objects.bulk_create(
+            Post(author_id=author_id, text='Пост для замера')
+            for author_id in rng.choices(
+                authors, weights, k=options['authors'] * options['posts']
+            )
+        )
+        readers = {}
+        for count in map(int, options['follows'].split(',')):
+            reader = User.objects.create(username=f'{PREFIX}-reader{count}')
+            Follow.objects.bulk_create(
+                Follow(user=reader, author_id=author_id)
+                for author_id in rng.sample(authors, min(count, len(authors)))
+            )
+            readers[count] = reader
+        return readers
+
+    def measure(self, reader, runs):
+        join = Post.objects.select_related('author', 'group').filter(
+            author__following__user=reader
+        )
+        author_ids = set(Follow.objects.filter(user=reader).values_list(
+            'author_id', flat=True
+        ))
+        expected, join_ms = timed(
+            lambda: [*join[:MAX_POSTS_ON_PAGE]], runs
+        )
+
+        def cold():
+            recent.forget(author_ids)
+            return recent.merged_posts(author_ids)[0]
+
+        _, cold_ms = timed(cold, runs)
+        merged, warm_ms = timed(
+            lambda: recent.merged_posts(author_ids)[0], runs
+        )
+        return {
+            'follows': len(author_ids),
+            'join_ms': round(join_ms, 3),
+            'merge_cold_ms': round(cold_ms, 3),
+            'merge_warm_ms': round(warm_ms, 3),
+            'same_page': (
+                [post.pk for post in merged]
+                == [post.pk for post in expected]
+            ),
+        }
+
+    def handle(self, *args, **options):
+        # Данные замера живут только внутри транзакции и откатываются.
+        with transaction.atomic():
+            readers = self.seed(options)
+            report = [
+                self.measure(reader, options['runs'])
+                for reader in readers.values()
+            ]
+            authors = list(Follow.objects.filter(
+                user__in=readers.values()
+            ).values_list('author_id', flat=True))
+            transaction.set_rollback(True)
+        # Списки откаченных авторов не должны пережить замер.
+        recent.forget(authors)
+        self.stdout.write(json.dumps(report, indent=2))
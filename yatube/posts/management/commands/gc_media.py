@@ -0,0 +1,175 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.models import KVStore
+
+from posts.models import Post
+
+MIN_AGE_MINUTES: int = 60
+WORKERS: int = 8
+BATCH_SIZE: int = 500
+
+
+def scan(root, base):
+    """Обходит дерево через os.scandir, не собирая список файлов.
+
+    Отдаёт (путь относительно base через '/', размер, mtime).
+    """
+    try:
+        entries = os.scandir(root)
+    except FileNotFoundError:
+        return
+    with entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from scan(entry.path, base)
+            elif entry.is_file(follow_symlinks=False):
+                stat = entry.stat()
+                path = os.path.relpath(entry.path, base).replace(os.sep, '/')
+                yield path, stat.st_size, stat.st_mtime
+
+
+def thumbnail_index():
+    """Читает kvstore sorl одним запросом.
+
+    Возвращает ключ по имени файла и ключи миниатюр по ключу источника.
+    """
+    prefix = thumbnail_settings.THUMBNAIL_KEY_PREFIX + '||'
+    keys, thumbnails = {}, {}
+    rows = KVStore.objects.filter(key__startswith=prefix).values_list(
+        'key', 'value'
+    )
+    for raw_key, value in rows.iterator():
+        _, identity, key = raw_key.split('||')
+        if identity == 'image':
+            keys[deserialize(value)['name']] = key
+        elif identity == 'thumbnails':
+            thumbnails[key] = deserialize(value)
+    return keys, thumbnails
+
+
+def find_orphans(min_age, keys, thumbnails):
+    """Отдаёт (вид, путь, размер) файлов, на которые никто не ссылается.
+
+    Файлы моложе min_age секунд пропускаются: их мог только что записать
+    ещё не закоммиченный пост или sorl.
+    """
+    referenced = set(
+        Post.objects.exclude(image='').values_list('image', flat=True)
+        .iterator()
+    )
+    names = {key: name for name, key in keys.items()}
+    storage = Post._meta.get_field('image').storage
+    live = set()
+    for name in referenced:
+        for key in thumbnails.get(ImageFile(name, storage).key, ()):
+            live.add(names.get(key))
+    cutoff = time.time() - min_age
+    root = settings.MEDIA_ROOT
+    sources = (
+        ('image', path, size)
+        for path, size, mtime in scan(os.path.join(root, 'posts'), root)
+        if path not in referenced and mtime < cutoff
+    )
+    cached = (
+        ('thumbnail', path, size)
+        for path, size, mtime in scan(
+            os.path.join(root, thumbnail_settings.THUMBNAIL_PREFIX), root
+        )
+        if path not in live and mtime < cutoff
+    )
+    yield from sources
+    yield from cached
+
+
+def stale_keys(paths, keys, thumbnails):
+    """Ключи kvstore удалённых файлов и списков их миниатюр."""
+    raw = []
+    for path in paths:
+        key = keys.get(path)
+        if key is None:
+            continue
+        raw.append('||'.join([
+            thumbnail_settings.THUMBNAIL_KEY_PREFIX, 'image', key
+        ]))
+        if key in thumbnails:
+            raw.append('||'.join([
+                thumbnail_settings.THUMBNAIL_KEY_PREFIX, 'thumbnails', key
+            ]))
+    return raw
+
+
+def remove(path, quarantine=None):
+    """Удаляет файл или переносит его в карантин с тем же путём."""
+    source = os.path.join(settings.MEDIA_ROOT, path)
+    try:
+        if quarantine:
+            os.renames(source, os.path.join(quarantine, path))
+        else:
+            os.remove(source)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Удаляет файлы медиа и миниатюры, на которые не ссылаются посты'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='только отчёт, ничего не трогать')
+        parser.add_argument('--quarantine',
+                            help='переносить сироты в этот каталог')
+        parser.add_argument('--min-age', type=int, default=MIN_AGE_MINUTES,
+                            help='не трогать файлы моложе, минут')
+        parser.add_argument('--workers', type=int, default=WORKERS)
+
+    def handle(self, *args, **options):
+        quarantine = options['quarantine']
+        totals = {'image': [0, 0], 'thumbnail': [0, 0]}
+        keys, thumbnails = thumbnail_index()
+        orphans = find_orphans(options['min_age'] * 60, keys, thumbnails)
+        with ThreadPoolExecutor(options['workers']) as pool:
+            for batch in batched(orphans, BATCH_SIZE):
+                for kind, path, size in batch:
+                    totals[kind][0] += 1
+                    totals[kind][1] += size
+                    if options['dry_run']:
+                        self.stdout.write(f'{kind}: {path}')
+                if options['dry_run']:
+                    continue
+                removed = filter(None, pool.map(
+                    partial(remove, quarantine=quarantine),
+                    [path for _, path, _ in batch],
+                ))
+                stale = stale_keys(removed, keys, thumbnails)
+                if stale:
+                    default.kvstore._delete_raw(*stale)
+
+        action = (
+            'найдено' if options['dry_run']
+            else 'перенесено' if quarantine else 'удалено'
+        )
+        for kind, label in (('image', 'Картинок'), ('thumbnail', 'Миниатюр')):
+            count, size = totals[kind]
+            self.stdout.write(
+                f'{label} {action}: {count}, {size / 1024:.1f} КБ'
+            )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import hashtags
+from posts.moderation import CHUNK_SIZE, chunks
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет индекс #тегов и @упоминаний по существующим постам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        done = 0
+        for ids in chunks(Post.objects.all(), options['chunk_size']):
+            rows = Post.objects.filter(pk__in=ids).values_list(
+                'pk', 'author_id', 'text'
+            )
+            with transaction.atomic():
+                hashtags.index_posts(list(rows))
+            done += len(ids)
+            self.stdout.write(f'Обработано постов: {done}')
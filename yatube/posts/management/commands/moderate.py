@@ -0,0 +1,78 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import moderation
+from posts.models import Group, Post, User
+
+
+def aware_date(value):
+    try:
+        date = datetime.datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise CommandError(f'Ожидается дата ГГГГ-ММ-ДД: {value}')
+    return timezone.make_aware(date)
+
+
+class Command(BaseCommand):
+    help = 'Массовая модерация: перенос и удаление постов, чистка комментариев'
+
+    def add_arguments(self, parser):
+        actions = parser.add_subparsers(dest='action', required=True)
+
+        move = actions.add_parser('move', help='перенести посты в группу')
+        move.add_argument('--group', help='slug группы; без него — из группы')
+        move.add_argument('--from-group', help='slug исходной группы')
+        move.add_argument('--author', help='username автора')
+
+        delete = actions.add_parser(
+            'delete-author', help='удалить все посты авторов'
+        )
+        delete.add_argument('usernames', nargs='+')
+
+        purge = actions.add_parser(
+            'purge-comments', help='удалить комментарии за период'
+        )
+        purge.add_argument('since', type=aware_date)
+        purge.add_argument('until', type=aware_date)
+
+    def progress(self, done):
+        self.stdout.write(f'обработано: {done}')
+
+    def handle(self, *args, **options):
+        action = options['action']
+        if action == 'move':
+            if not options['from_group'] and not options['author']:
+                raise CommandError(
+                    'Укажите --from-group или --author: без отбора '
+                    'перенеслись бы все посты'
+                )
+            group = None
+            if options['group']:
+                group = Group.objects.filter(slug=options['group']).first()
+                if group is None:
+                    raise CommandError(f'Нет группы {options["group"]}')
+            posts = Post.objects.all()
+            if options['from_group']:
+                posts = posts.filter(group__slug=options['from_group'])
+            if options['author']:
+                posts = posts.filter(author__username=options['author'])
+            done = moderation.move_posts(posts, group, self.progress)
+            self.stdout.write(f'Перенесено постов: {done}')
+        elif action == 'delete-author':
+            protected = moderation.protected_relations(Post)
+            if protected:
+                raise CommandError(
+                    f'Посты защищены от удаления: {", ".join(protected)}'
+                )
+            authors = list(User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('pk', flat=True))
+            done = moderation.delete_by_authors(authors, self.progress)
+            self.stdout.write(f'Удалено постов: {done}')
+        else:
+            done = moderation.purge_comments(
+                options['since'], options['until'], self.progress
+            )
+            self.stdout.write(f'Удалено комментариев: {done}')
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_recommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.PositiveIntegerField(verbose_name='Bucket')),
+                ('comments', models.PositiveIntegerField(default=0, verbose_name='Comments')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Views')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='posts.Post', verbose_name='Post')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['bucket'], name='posts_activ_bucket_b74cdb_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='activity',
+            constraint=models.UniqueConstraint(fields=('post', 'bucket'), name='unique_activity_bucket'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:29
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_buckets(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ArchiveBucket = apps.get_model('posts', 'ArchiveBucket')
+    counts = Counter()
+    rows = Post.objects.values_list('pub_date', 'author_id', 'group_id')
+    for pub_date, author_id, group_id in rows.iterator():
+        date = timezone.localtime(pub_date).date()
+        scopes = [('site', 0), ('author', author_id)]
+        if group_id is not None:
+            scopes.append(('group', group_id))
+        for scope in scopes:
+            for key in ((0, 0), (date.month, 0), (date.month, date.day)):
+                counts[(*scope, date.year, *key)] += 1
+    ArchiveBucket.objects.bulk_create(
+        (
+            ArchiveBucket(
+                scope=scope, object_id=object_id,
+                year=year, month=month, day=day, count=count,
+            )
+            for (scope, object_id, year, month, day), count in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_follow_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchiveBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('site', 'Site'), ('group', 'Group'), ('author', 'Author')], max_length=10, verbose_name='Scope')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Object id')),
+                ('year', models.PositiveSmallIntegerField(verbose_name='Year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Month')),
+                ('day', models.PositiveSmallIntegerField(verbose_name='Day')),
+                ('count', models.IntegerField(default=0, verbose_name='Count')),
+            ],
+            options={
+                'ordering': ['year', 'month', 'day'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='pub_date',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Publication date'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'pub_date'], name='posts_post_author__b65dbb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', 'pub_date'], name='posts_post_group_i_5ba9fa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='archivebucket',
+            constraint=models.UniqueConstraint(fields=('scope', 'object_id', 'year', 'month', 'day'), name='unique_archive_bucket'),
+        ),
+        migrations.RunPython(fill_buckets, migrations.RunPython.noop),
+    ]
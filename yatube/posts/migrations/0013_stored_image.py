@@ -0,0 +1,42 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:44
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def count_refs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    StoredImage = apps.get_model('posts', 'StoredImage')
+    rows = Post.objects.exclude(image='').values('image').annotate(
+        refs=Count('pk')
+    ).order_by()
+    StoredImage.objects.bulk_create(
+        (StoredImage(name=row['image'], refs=row['refs'])
+         for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_comment_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Name')),
+                ('refs', models.IntegerField(default=0, verbose_name='References')),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentHashStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_refs, migrations.RunPython.noop),
+    ]
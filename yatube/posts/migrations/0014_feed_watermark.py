@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-19 20:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0013_stored_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seen', models.DateTimeField(verbose_name='Seen')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='feed_watermark', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+        ),
+    ]
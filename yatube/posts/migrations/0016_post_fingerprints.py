@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-19 20:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_hashtags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostFingerprint',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='posts.Post', verbose_name='Post')),
+                ('signature', models.BinaryField(verbose_name='Signature')),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='posts.Post', verbose_name='Duplicate of')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FingerprintBand',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Band')),
+                ('value', models.BigIntegerField(verbose_name='Value')),
+                ('fingerprint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='posts.PostFingerprint', verbose_name='Fingerprint')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='fingerprintband',
+            index=models.Index(fields=['band', 'value'], name='posts_finge_band_a0d705_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 2.2.16 on 2026-10-19 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_views'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DigestWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_until', models.DateTimeField(verbose_name='Sent until')),
+            ],
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentHashStorage
+
 User = get_user_model()
 
 
@@ -16,6 +18,7 @@ class Group(models.Model):
 class Post(models.Model):
     text = models.TextField(verbose_name='Text')
     pub_date = models.DateTimeField(auto_now_add=True,
+                                    db_index=True,
                                     verbose_name='Publication date')
     author = models.ForeignKey(
         User,
@@ -34,19 +37,26 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentHashStorage(),
         blank=True
     )
+    views = models.PositiveIntegerField(default=0, verbose_name='Views')
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
-        ordering = ['-pub_date']
+        ordering = ['-pub_date', '-pk']
+        indexes = [
+            models.Index(fields=['author', 'pub_date']),
+            models.Index(fields=['group', 'pub_date']),
+        ]
 
 
 class Comment(models.Model):
     text = models.TextField(verbose_name='Text')
     created = models.DateTimeField(auto_now_add=True,
+                                   db_index=True,
                                    verbose_name='Created')
     author = models.ForeignKey(
         User,
@@ -82,3 +92,195 @@ class Follow(models.Model):
         related_name='follower',
         verbose_name='User'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow'
+            ),
+        ]
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True, verbose_name='Name')
+
+    def __str__(self):
+        return self.name
+
+
+class PostTag(models.Model):
+    tag = models.ForeignKey(
+        Tag,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Tag'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='post_tags',
+        verbose_name='Post'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tag', 'post'],
+                name='unique_post_tag'
+            ),
+        ]
+
+
+class Mention(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='User'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='mentions',
+        verbose_name='Post'
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_mention'
+            ),
+        ]
+
+
+class PostFingerprint(models.Model):
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint',
+        verbose_name='Post'
+    )
+    signature = models.BinaryField(verbose_name='Signature')
+    duplicate_of = models.ForeignKey(
+        Post,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='duplicates',
+        verbose_name='Duplicate of'
+    )
+
+
+class FingerprintBand(models.Model):
+    fingerprint = models.ForeignKey(
+        PostFingerprint,
+        on_delete=models.CASCADE,
+        related_name='bands',
+        verbose_name='Fingerprint'
+    )
+    band = models.PositiveSmallIntegerField(verbose_name='Band')
+    value = models.BigIntegerField(verbose_name='Value')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['band', 'value']),
+        ]
+
+
+class FeedWatermark(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_watermark',
+        verbose_name='User'
+    )
+    seen = models.DateTimeField(verbose_name='Seen')
+
+
+class Recommendation(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommendations',
+        verbose_name='User'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='recommended_to',
+        verbose_name='Author'
+    )
+    score = models.PositiveIntegerField(verbose_name='Score')
+
+    class Meta:
+        ordering = ['-score']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_recommendation'
+            ),
+        ]
+
+
+class Activity(models.Model):
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='activity',
+        verbose_name='Post'
+    )
+    bucket = models.PositiveIntegerField(verbose_name='Bucket')
+    comments = models.PositiveIntegerField(default=0, verbose_name='Comments')
+    views = models.PositiveIntegerField(default=0, verbose_name='Views')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'bucket'],
+                name='unique_activity_bucket'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['bucket']),
+        ]
+
+
+class ArchiveBucket(models.Model):
+    SITE = 'site'
+    GROUP = 'group'
+    AUTHOR = 'author'
+    SCOPES = (
+        (SITE, 'Site'),
+        (GROUP, 'Group'),
+        (AUTHOR, 'Author'),
+    )
+
+    scope = models.CharField(
+        max_length=10, choices=SCOPES, verbose_name='Scope'
+    )
+    object_id = models.PositiveIntegerField(verbose_name='Object id')
+    year = models.PositiveSmallIntegerField(verbose_name='Year')
+    month = models.PositiveSmallIntegerField(verbose_name='Month')
+    day = models.PositiveSmallIntegerField(verbose_name='Day')
+    count = models.IntegerField(default=0, verbose_name='Count')
+
+    class Meta:
+        ordering = ['year', 'month', 'day']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['scope', 'object_id', 'year', 'month', 'day'],
+                name='unique_archive_bucket'
+            ),
+        ]
+
+
+class StoredImage(models.Model):
+    name = models.CharField(max_length=255, unique=True, verbose_name='Name')
+    refs = models.IntegerField(default=0, verbose_name='References')
+
+
+class DigestWatermark(models.Model):
+    sent_until = models.DateTimeField(verbose_name='Sent until')
@@ -0,0 +1,207 @@
+import threading
+from contextlib import contextmanager
+
+from django.db import models, transaction
+
+from . import archive, images, purge, recent, sitemaps, unread
+from .models import Comment, Post
+
+CHUNK_SIZE: int = 1000
+
+_bulk = threading.local()
+
+
+@contextmanager
+def bulk():
+    """Внутри блока сигналы удаления постов ничего не пересчитывают.
+
+    Пакетное удаление само правит счётчики и кеши за всю порцию.
+    """
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        _bulk.active = False
+
+
+def in_bulk():
+    return getattr(_bulk, 'active', False)
+
+
+def chunks(queryset, size=CHUNK_SIZE):
+    """Отдаёт pk выборки порциями по возрастанию, без OFFSET.
+
+    В памяти одновременно только одна порция ключей.
+    """
+    last = 0
+    while True:
+        ids = list(
+            queryset.filter(pk__gt=last).order_by('pk').values_list(
+                'pk', flat=True
+            )[:size]
+        )
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def post_rows(ids):
+    return Post.objects.filter(pk__in=ids).values_list(
+        'pub_date', 'author_id', 'group_id'
+    )
+
+
+def schedule_purge(ids, rows, *group_ids):
+    """Очищает в прокси страницы порции: ленты, посты, авторов, группы."""
+    group_ids = {*group_ids, *(group_id for *_, group_id in rows)}
+    purge.schedule(
+        purge.FEED_KEY,
+        *map(purge.post_key, ids),
+        *{purge.author_key(author_id) for _, author_id, _ in rows},
+        *(purge.group_key(group_id) for group_id in group_ids
+          if group_id is not None),
+    )
+
+
+def move_posts(queryset, group, progress=None):
+    """Переносит посты в группу (None — убрать из группы)."""
+    group_id = group.pk if group is not None else None
+    done = 0
+    for ids in chunks(queryset):
+        with transaction.atomic():
+            rows = list(post_rows(ids))
+            deltas = archive.post_deltas(rows, -1)
+            deltas.update(archive.post_deltas(
+                [(pub_date, author_id, group_id)
+                 for pub_date, author_id, _ in rows],
+                1,
+            ))
+            Post.objects.filter(pk__in=ids).update(group_id=group_id)
+            archive.apply_deltas(deltas)
+            sitemaps.touch(
+                [('groups', group_id)]
+                + [('groups', old_group_id) for *_, old_group_id in rows]
+            )
+            schedule_purge(ids, rows, group_id)
+        done += len(ids)
+        if progress:
+            progress(done)
+    return done
+
+
+def protected_relations(model):
+    """Связи, которые запрещают удалять model, — «Модель.поле»."""
+    return [
+        f'{relation.related_model.__name__}.{relation.field.name}'
+        for relation in model._meta.related_objects
+        if relation.on_delete == models.PROTECT
+    ]
+
+
+def dependents(model, ids):
+    """Связи, которых касается удаление model с pk из ids, с выборками.
+
+    Каскады раскрываются вглубь, и зависимые зависимых идут раньше
+    своих владельцев.
+    """
+    for relation in model._meta.related_objects:
+        if not relation.one_to_many and not relation.one_to_one:
+            continue
+        related = relation.related_model._base_manager.filter(
+            **{f'{relation.field.name}__in': ids}
+        )
+        if relation.on_delete == models.CASCADE:
+            yield from dependents(relation.related_model, related.values('pk'))
+        yield relation, related
+
+
+def delete_dependents(model, ids):
+    """Разбирает каскады на model вручную, по одному запросу на связь.
+
+    Зависимые удаляются прямым DELETE без загрузки объектов и без их
+    сигналов: всё, что делали бы сигналы (например, очистку страниц
+    поста в прокси после удаления комментариев), вызывающий делает
+    один раз за порцию. Связи с другим on_delete остаются обычному
+    удалению самих объектов.
+    """
+    for relation, related in dependents(model, ids):
+        if relation.on_delete == models.CASCADE:
+            related._raw_delete(related.db)
+        elif relation.on_delete == models.SET_NULL:
+            related.update(**{relation.field.name: None})
+
+
+def deletion_summary(queryset):
+    """Что удалит delete_posts(queryset), не загружая объектов.
+
+    Возвращает число строк по моделям, начиная с самих постов,
+    и связи PROTECT, у которых есть строки, — «Модель.поле».
+    """
+    ids = queryset.values('pk')
+    counts = {Post: queryset.count()}
+    protected = []
+    for relation, related in dependents(Post, ids):
+        model = relation.related_model
+        if relation.on_delete == models.CASCADE:
+            counts[model] = counts.get(model, 0) + related.count()
+        elif relation.on_delete == models.PROTECT and related.exists():
+            protected.append(f'{model.__name__}.{relation.field.name}')
+    return counts, protected
+
+
+def delete_posts(queryset, progress=None):
+    """Удаляет посты порциями вместе с комментариями и активностью.
+
+    Сигналы post_delete постов в блоке bulk() ничего не делают:
+    счётчики архива и ссылки на картинки поправляются за порцию целиком.
+    """
+    done = 0
+    for ids in chunks(queryset):
+        with transaction.atomic(), bulk():
+            rows = list(post_rows(ids))
+            deltas = archive.post_deltas(rows, -1)
+            names = list(Post.objects.filter(pk__in=ids).exclude(
+                image=''
+            ).values_list('image', flat=True))
+            delete_dependents(Post, ids)
+            Post.objects.filter(pk__in=ids).delete()
+            archive.apply_deltas(deltas)
+            sitemaps.touch(
+                [('posts', pk) for pk in ids]
+                + [('profiles', author_id) for _, author_id, _ in rows]
+                + [('groups', group_id) for *_, group_id in rows]
+            )
+            schedule_purge(ids, rows)
+            authors = {author_id for _, author_id, _ in rows}
+            recent.forget(authors)
+            unread.authors_changed(authors)
+            if names:
+                images.release(names)
+        done += len(ids)
+        if progress:
+            progress(done)
+    return done
+
+
+def delete_by_authors(authors, progress=None):
+    return delete_posts(
+        Post.objects.filter(author__in=authors), progress=progress
+    )
+
+
+def delete_comments(queryset, progress=None):
+    done = 0
+    for ids in chunks(queryset):
+        done += Comment.objects.filter(pk__in=ids).delete()[0]
+        if progress:
+            progress(done)
+    return done
+
+
+def purge_comments(since, until, progress=None):
+    """Удаляет комментарии с created в [since, until)."""
+    return delete_comments(
+        Comment.objects.filter(created__gte=since, created__lt=until),
+        progress=progress,
+    )
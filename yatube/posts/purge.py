@@ -0,0 +1,101 @@
+import threading
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import surrogate
+
+from . import trending
+from .models import ArchiveBucket
+from .tasks import purge_keys
+
+# Ключ общих лент: главной, архива сайта, популярного и sitemap.
+FEED_KEY = 'posts'
+GENERATION_KEY = 'purge:generation'
+
+_pending = threading.local()
+
+
+def post_key(post_id):
+    return f'post-{post_id}'
+
+
+def author_key(author_id):
+    return f'author-{author_id}'
+
+
+def group_key(group_id):
+    return f'group-{group_id}'
+
+
+# Ключ страниц архива по области счётчика.
+SCOPE_KEYS = {
+    ArchiveBucket.SITE: lambda object_id: FEED_KEY,
+    ArchiveBucket.GROUP: group_key,
+    ArchiveBucket.AUTHOR: author_key,
+}
+
+
+def post_keys(post):
+    keys = [post_key(post.pk), author_key(post.author_id)]
+    if post.group_id is not None:
+        keys.append(group_key(post.group_id))
+    return keys
+
+
+def tag_posts(request, posts, *keys):
+    """Помечает ответ ключами keys и ключами всех показанных постов."""
+    surrogate.add(request, *keys)
+    for post in posts:
+        surrogate.add(request, *post_keys(post))
+
+
+def generation():
+    """Поколение кешей лент в Django; входит в их ключи."""
+    return cache.get(GENERATION_KEY, 0)
+
+
+def invalidate_fragments():
+    """Сбрасывает кеши Django, из которых прокси заново наберёт страницы.
+
+    Иначе прокси сразу после очистки перезапросит страницу и закеширует
+    тот же устаревший фрагмент уже до следующей очистки.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 1, None)
+    cache.delete(trending.TRENDING_KEY)
+
+
+class PurgeBatch:
+    """Ключи одной транзакции: уходят одной задачей после коммита."""
+
+    def __init__(self):
+        self.keys = set()
+
+    def __call__(self):
+        invalidate_fragments()
+        purge_keys.delay(sorted(self.keys))
+
+
+def schedule(*keys):
+    """Ставит ключи на очистку после коммита текущей транзакции.
+
+    Все изменения одной транзакции (например, массовая модерация)
+    складываются в один батч, а не в задачу на каждый сигнал. Поток
+    держит на батч только слабую ссылку: при откате Django отбрасывает
+    колбэк, батч пропадает, и следующий ключ заводит новый.
+    """
+    if not settings.SURROGATE_PURGE_ENDPOINTS:
+        return
+    batch = _pending.batch() if hasattr(_pending, 'batch') else None
+    if batch is not None and transaction.get_connection().in_atomic_block:
+        batch.keys.update(keys)
+        return
+    batch = PurgeBatch()
+    batch.keys.update(keys)
+    _pending.batch = weakref.ref(batch)
+    transaction.on_commit(batch)
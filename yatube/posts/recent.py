@@ -0,0 +1,109 @@
+import heapq
+from itertools import islice
+
+from django.core.cache import cache
+from django.core.paginator import Page
+
+from .models import Post
+from .utils import MAX_POSTS_ON_PAGE, CountedPaginator
+
+# Лишний элемент нужен, чтобы знать, есть ли вторая страница.
+RECENT_SIZE: int = MAX_POSTS_ON_PAGE + 1
+RECENT_TIMEOUT: int = 60 * 60 * 24
+# Дальше слияние в памяти проигрывает JOIN по подпискам.
+MERGE_MAX_AUTHORS: int = 50
+
+
+def recent_key(author_id):
+    return f'recent:{author_id}'
+
+
+def author_recent(author_id):
+    return [
+        (pub_date, pk) for pk, pub_date in Post.objects.filter(
+            author_id=author_id
+        ).order_by('-pub_date', '-pk').values_list('pk', 'pub_date')[
+            :RECENT_SIZE
+        ]
+    ]
+
+
+def recent_lists(author_ids):
+    """Списки (pub_date, pk) последних постов авторов, по убыванию.
+
+    Все списки читаются из кеша одним get_many; недостающие строятся
+    запросом на автора и кладутся обратно одним set_many.
+    """
+    keys = {recent_key(author_id): author_id for author_id in author_ids}
+    lists = cache.get_many(keys)
+    missing = {
+        key: author_recent(author_id)
+        for key, author_id in keys.items() if key not in lists
+    }
+    if missing:
+        cache.set_many(missing, RECENT_TIMEOUT)
+    return [*lists.values(), *missing.values()]
+
+
+def merged_posts(author_ids, size=MAX_POSTS_ON_PAGE):
+    """Первые size постов авторов: k-way слияние списков через кучу.
+
+    Возвращает посты и признак того, что за ними есть ещё.
+    """
+    entries = list(islice(
+        heapq.merge(*recent_lists(author_ids), reverse=True), size + 1
+    ))
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for _, pk in entries[:size]]
+    )
+    return (
+        [posts[pk] for _, pk in entries[:size] if pk in posts],
+        len(entries) > size,
+    )
+
+
+def first_page(post_list, author_ids):
+    """Первая страница ленты подписок, собранная без JOIN по Follow."""
+    posts, has_next = merged_posts(author_ids)
+    # Как у LookaheadPaginator: count — нижняя оценка для has_next.
+    paginator = CountedPaginator(
+        post_list, MAX_POSTS_ON_PAGE, len(posts) + has_next
+    )
+    return Page(posts, 1, paginator)
+
+
+def post_saved(post):
+    """Вставляет пост в закешированный список автора или сдвигает его."""
+    key = recent_key(post.author_id)
+    entries = cache.get(key)
+    if entries is None:
+        return
+    rest = [entry for entry in entries if entry[1] != post.pk]
+    entry = (post.pub_date, post.pk)
+    if len(entries) < RECENT_SIZE or entry > entries[-1]:
+        rest = sorted([*rest, entry], reverse=True)[:RECENT_SIZE]
+    elif len(rest) < len(entries):
+        # Пост уехал за конец списка: его место займёт неизвестный пост.
+        cache.delete(key)
+        return
+    cache.set(key, rest, RECENT_TIMEOUT)
+
+
+def post_deleted(post):
+    key = recent_key(post.author_id)
+    entries = cache.get(key)
+    if entries is None or all(pk != post.pk for _, pk in entries):
+        return
+    if len(entries) < RECENT_SIZE:
+        cache.set(
+            key,
+            [entry for entry in entries if entry[1] != post.pk],
+            RECENT_TIMEOUT,
+        )
+    else:
+        # Следующий по давности пост в списке не хранится.
+        cache.delete(key)
+
+
+def forget(author_ids):
+    cache.delete_many([recent_key(author_id) for author_id in author_ids])
@@ -0,0 +1,213 @@
+from functools import wraps
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (archive, autocomplete, duplicates, hashtags, images,
+               moderation, purge, recent, sitemaps, trending, unread)
+from .follows import following_key, update_following
+from .models import ArchiveBucket, Comment, Follow, Group, Post, User
+
+
+def unless_bulk(func):
+    """Пропускает сигнал внутри пакетной модерации: она считает сама."""
+    @wraps(func)
+    def wrapper(sender, instance, **kwargs):
+        if not moderation.in_bulk():
+            func(sender, instance, **kwargs)
+    return wrapper
+
+
+@receiver(post_save, sender=Comment)
+def comment_activity(sender, instance, created, **kwargs):
+    if created:
+        trending.record(instance.post_id, comments=1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        update_following(instance.user_id, instance.author_id, True)
+    else:
+        cache.delete(following_key(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    update_following(instance.user_id, instance.author_id, False)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_saved(sender, instance, **kwargs):
+    (
+        instance._saved_group_id, instance._saved_image, instance._saved_text
+    ) = (
+        Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first()
+        if instance.pk else None
+    ) or (None, '', None)
+
+
+@receiver(post_save, sender=Post)
+def post_archive(sender, instance, created, **kwargs):
+    if created:
+        archive.change(
+            instance.pub_date,
+            archive.post_scopes(instance.author_id, instance.group_id),
+            1,
+        )
+        return
+    old_group_id = instance._saved_group_id
+    if old_group_id != instance.group_id:
+        for group_id, delta in ((old_group_id, -1), (instance.group_id, 1)):
+            if group_id is not None:
+                archive.change(
+                    instance.pub_date, [(ArchiveBucket.GROUP, group_id)], delta
+                )
+
+
+@receiver(post_delete, sender=Post)
+@unless_bulk
+def post_unarchive(sender, instance, **kwargs):
+    archive.change(
+        instance.pub_date,
+        archive.post_scopes(instance.author_id, instance.group_id),
+        -1,
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_image_refs(sender, instance, created, **kwargs):
+    old, new = instance._saved_image, instance.image.name or ''
+    if old == new:
+        return
+    if new:
+        images.retain(new)
+    if old:
+        images.release([old])
+
+
+@receiver(post_delete, sender=Post)
+@unless_bulk
+def post_image_released(sender, instance, **kwargs):
+    if instance.image:
+        images.release([instance.image.name])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@unless_bulk
+def post_purge(sender, instance, **kwargs):
+    keys = [purge.FEED_KEY, *purge.post_keys(instance)]
+    old_group_id = getattr(instance, '_saved_group_id', None)
+    if old_group_id not in (None, instance.group_id):
+        keys.append(purge.group_key(old_group_id))
+    purge.schedule(*keys)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_purge(sender, instance, **kwargs):
+    purge.schedule(purge.post_key(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_purge(sender, instance, **kwargs):
+    purge.schedule(purge.FEED_KEY, purge.group_key(instance.pk))
+
+
+@receiver(post_save, sender=User)
+def author_purge(sender, instance, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login — страницы не меняются.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    purge.schedule(purge.author_key(instance.pk))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@unless_bulk
+def post_sitemap(sender, instance, **kwargs):
+    sitemaps.touch(sitemaps.post_pairs(
+        instance.pk, instance.author_id, instance.group_id,
+        getattr(instance, '_saved_group_id', None),
+    ))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_sitemap(sender, instance, **kwargs):
+    sitemaps.touch([('groups', instance.pk)])
+
+
+@receiver(post_save, sender=User)
+def author_sitemap(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    sitemaps.touch([('profiles', instance.pk)])
+
+
+@receiver(post_save, sender=Post)
+def post_recent_saved(sender, instance, **kwargs):
+    recent.post_saved(instance)
+
+
+@receiver(post_delete, sender=Post)
+@unless_bulk
+def post_recent_deleted(sender, instance, **kwargs):
+    recent.post_deleted(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_unread_saved(sender, instance, created, **kwargs):
+    if created:
+        unread.authors_changed([instance.author_id])
+
+
+@receiver(post_delete, sender=Post)
+@unless_bulk
+def post_unread_deleted(sender, instance, **kwargs):
+    unread.authors_changed([instance.author_id])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_unread(sender, instance, **kwargs):
+    unread.forget([instance.user_id])
+
+
+@receiver(post_save, sender=Post)
+def post_hashtags(sender, instance, created, **kwargs):
+    if created or instance.text != getattr(instance, '_saved_text', None):
+        hashtags.reindex_post(instance, created)
+
+
+@receiver(post_save, sender=User)
+def user_autocomplete(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    autocomplete.user_changed(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_autocomplete_deleted(sender, instance, **kwargs):
+    autocomplete.user_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=Group)
+def group_autocomplete(sender, instance, **kwargs):
+    autocomplete.group_changed(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_autocomplete_deleted(sender, instance, **kwargs):
+    autocomplete.group_changed(instance, deleted=True)
+
+
+@receiver(post_save, sender=Post)
+def post_fingerprint(sender, instance, created, **kwargs):
+    if created or instance.text != getattr(instance, '_saved_text', None):
+        duplicates.fingerprint(instance)
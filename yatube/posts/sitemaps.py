@@ -0,0 +1,173 @@
+from xml.sax.saxutils import escape
+
+from django.core.cache import cache
+from django.db.models import F, Max
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import iri_to_uri
+
+from .models import Group, Post, User
+
+SITEMAP_SIZE: int = 50000
+INDEX_TIMEOUT: int = 60 * 10
+INDEX_KEY = 'sitemap:index'
+WRITE_BATCH: int = 1000
+
+URLSET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+URLSET_TAIL = '</urlset>\n'
+INDEX_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+)
+INDEX_TAIL = '</sitemapindex>\n'
+
+
+def post_rows(start, stop):
+    return Post.objects.filter(pk__gte=start, pk__lt=stop).order_by(
+        'pk'
+    ).values_list('pk', 'pub_date')
+
+
+def group_rows(start, stop):
+    return Group.objects.filter(pk__gte=start, pk__lt=stop).annotate(
+        lastmod=Max('posts__pub_date')
+    ).filter(lastmod__isnull=False).order_by('pk').values_list(
+        'slug', 'lastmod'
+    )
+
+
+def profile_rows(start, stop):
+    return User.objects.filter(pk__gte=start, pk__lt=stop).annotate(
+        lastmod=Max('posts__pub_date')
+    ).filter(lastmod__isnull=False).order_by('pk').values_list(
+        'username', 'lastmod'
+    )
+
+
+# Раздел: поле Post, по диапазонам которого режутся куски, имя адреса,
+# образец аргумента для шаблона адреса и выборка строк куска.
+SECTIONS = {
+    'posts': ('pk', 'posts:post_detail', 0, post_rows),
+    'groups': ('group_id', 'posts:group_posts', 'slug', group_rows),
+    'profiles': ('author_id', 'posts:profile', 'username', profile_rows),
+}
+
+
+def chunk_range(chunk):
+    return chunk * SITEMAP_SIZE, (chunk + 1) * SITEMAP_SIZE
+
+
+def stamp_key(section, chunk):
+    return f'sitemap:lastmod:{section}:{chunk}'
+
+
+def touch(pairs):
+    """Отмечает изменёнными сейчас куски с парами (раздел, значение поля).
+
+    Удаление поста или новый slug группы не двигают max(pub_date),
+    поэтому дата куска хранится в кеше и сдвигается здесь.
+    """
+    now = timezone.now()
+    cache.set_many({
+        stamp_key(section, value // SITEMAP_SIZE): now
+        for section, value in pairs if value is not None
+    }, None)
+    cache.delete(INDEX_KEY)
+
+
+def post_pairs(pk, author_id, *group_ids):
+    return [
+        ('posts', pk), ('profiles', author_id),
+        *(('groups', group_id) for group_id in group_ids),
+    ]
+
+
+def index_entries():
+    """Непустые куски всех разделов с датой последнего изменения каждого.
+
+    Куски — диапазоны ключей, а не страницы с OFFSET, поэтому
+    один GROUP BY на раздел находит их все.
+    """
+    entries = cache.get(INDEX_KEY)
+    if entries is None:
+        entries = []
+        for section, (field, *_) in SECTIONS.items():
+            rows = Post.objects.exclude(**{field: None}).annotate(
+                chunk=F(field) / SITEMAP_SIZE
+            ).values('chunk').annotate(
+                lastmod=Max('pub_date')
+            ).order_by('chunk').values_list('chunk', 'lastmod')
+            entries.extend(
+                (section, chunk, lastmod) for chunk, lastmod in rows
+            )
+        stamps = cache.get_many(
+            [stamp_key(section, chunk) for section, chunk, _ in entries]
+        )
+        entries = [
+            (section, chunk, max(
+                lastmod, stamps.get(stamp_key(section, chunk), lastmod)
+            ))
+            for section, chunk, lastmod in entries
+        ]
+        cache.set(INDEX_KEY, entries, INDEX_TIMEOUT)
+    return entries
+
+
+def chunk_lastmod(section, chunk):
+    """Дата изменения куска: из кеша, а при его отсутствии — по постам."""
+    key = stamp_key(section, chunk)
+    lastmod = cache.get(key)
+    if lastmod is None:
+        field = SECTIONS[section][0]
+        start, stop = chunk_range(chunk)
+        lastmod = Post.objects.filter(**{
+            f'{field}__gte': start, f'{field}__lt': stop,
+        }).aggregate(lastmod=Max('pub_date'))['lastmod']
+        if lastmod is not None:
+            # add, а не set: не затираем отметку, поставленную touch
+            # пока считался агрегат.
+            cache.add(key, lastmod, None)
+            lastmod = cache.get(key, lastmod)
+    return lastmod
+
+
+def batched_lines(head, lines, tail):
+    """Склеивает строки пачками, чтобы не отдавать по строке на запись."""
+    yield head
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == WRITE_BATCH:
+            yield ''.join(batch)
+            batch = []
+    yield ''.join(batch)
+    yield tail
+
+
+def render_index(base, entries):
+    lines = (
+        '<sitemap><loc>{}</loc><lastmod>{}</lastmod></sitemap>\n'.format(
+            escape(base + reverse('posts:sitemap', args=[section, chunk])),
+            lastmod.isoformat(),
+        )
+        for section, chunk, lastmod in entries
+    )
+    return batched_lines(INDEX_HEAD, lines, INDEX_TAIL)
+
+
+def render_chunk(base, section, chunk):
+    """Потоком отдаёт адреса куска, читая строки курсором по порядку pk."""
+    _, url_name, sample, rows = SECTIONS[section]
+    # Один reverse на кусок вместо reverse на каждый из тысяч адресов.
+    pattern = base + reverse(url_name, args=[sample]).replace(
+        str(sample), '{}', 1
+    )
+    lines = (
+        f'<url><loc>{escape(iri_to_uri(pattern.format(value)))}</loc>'
+        f'<lastmod>{lastmod.isoformat()}</lastmod></url>\n'
+        for value, lastmod in rows(*chunk_range(chunk)).iterator()
+    )
+    return batched_lines(URLSET_HEAD, lines, URLSET_TAIL)
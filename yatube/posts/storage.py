@@ -0,0 +1,89 @@
+import hashlib
+import os
+import uuid
+from contextlib import suppress
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE: int = 64 * 1024
+
+
+def content_hash(content):
+    """Хеш содержимого: берётся готовый из обработчика загрузки,
+    иначе считается потоком по кускам файла.
+    """
+    digest = getattr(content, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+@deconstructible
+class ContentHashStorage(FileSystemStorage):
+    """Хранит файлы под именем из хеша содержимого.
+
+    Одинаковые загрузки получают одно имя и один файл на диске,
+    а значит и один набор миниатюр sorl.
+    """
+
+    def hashed_name(self, name, content):
+        directory, filename = os.path.split(name)
+        digest = content_hash(content)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Имя определяется содержимым, суффиксы против коллизий не нужны.
+        return name
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        full_path = self.path(name)
+        if os.path.exists(full_path):
+            # Освежаем mtime, чтобы gc_media не снёс файл, который
+            # прямо сейчас получает новую ссылку.
+            os.utime(full_path)
+            return name
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory, self.directory_permissions_mode, exist_ok=True
+                )
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        # Родительский _save на FileExistsError просит новое имя и пишет
+        # снова — с одним и тем же именем это вечный цикл. Файл пишется
+        # во временный и ставится на место ссылкой: читатели не видят
+        # его недописанным, а проигравшая гонку загрузка просто
+        # получает готовый файл.
+        temp_path = f'{full_path}.{uuid.uuid4().hex}.part'
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            with os.fdopen(fd, 'wb') as destination:
+                for chunk in content.chunks():
+                    destination.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+            try:
+                os.link(temp_path, full_path)
+            except FileExistsError:
+                os.utime(full_path)
+            except OSError:
+                # ФС без жёстких ссылок (FAT, часть сетевых и overlay):
+                # ставим переименованием. Содержимое у файлов одно,
+                # а замена атомарна, так что читатель видит целый файл.
+                os.replace(temp_path, full_path)
+        finally:
+            with suppress(FileNotFoundError):
+                os.remove(temp_path)
+        return name
@@ -0,0 +1,44 @@
+from itertools import islice
+
+from django.conf import settings
+
+from tasks.queue import task
+
+from .models import Post
+
+POST_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+PURGE_BATCH: int = 256
+PURGE_TIMEOUT: int = 5
+
+
+@task
+def warm_thumbnails(post_id):
+    """Заранее строит миниатюру, чтобы её не рендерил первый читатель."""
+    from sorl.thumbnail import get_thumbnail
+
+    post = Post.objects.filter(pk=post_id).first()
+    if post and post.image:
+        geometry, options = POST_THUMBNAIL
+        get_thumbnail(post.image, geometry, **options)
+
+
+@task
+def purge_keys(keys):
+    """Рассылает ключи на очистку всем прокси из SURROGATE_PURGE_ENDPOINTS.
+
+    Ключи уходят пачками по PURGE_BATCH в одном POST; ошибка любого
+    адреса роняет задачу, и очередь повторит её целиком.
+    """
+    import requests
+
+    keys = iter(keys)
+    while True:
+        batch = list(islice(keys, PURGE_BATCH))
+        if not batch:
+            return
+        for endpoint in settings.SURROGATE_PURGE_ENDPOINTS:
+            requests.post(
+                endpoint,
+                json={'surrogate_keys': batch},
+                timeout=PURGE_TIMEOUT,
+            ).raise_for_status()
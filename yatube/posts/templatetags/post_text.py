@@ -0,0 +1,26 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import escape, format_html
+from django.utils.safestring import mark_safe
+
+from posts.hashtags import TOKEN_RE, normalize
+
+register = template.Library()
+
+
+@register.filter
+def linkify(text):
+    """Текст поста со ссылками на ленты #тегов и профили @упомянутых."""
+    parts = []
+    last = 0
+    for match in TOKEN_RE.finditer(text):
+        tag, username = match.groups()
+        url = (
+            reverse('posts:tag_posts', args=[normalize(tag)]) if tag
+            else reverse('posts:profile', args=[username])
+        )
+        parts.append(escape(text[last:match.start()]))
+        parts.append(format_html('<a href="{}">{}</a>', url, match.group()))
+        last = match.end()
+    parts.append(escape(text[last:]))
+    return mark_safe(''.join(parts))
@@ -0,0 +1,11 @@
+from django import template
+
+from posts.counters import views
+
+register = template.Library()
+
+
+@register.filter
+def view_count(post):
+    """Просмотры поста, включая ещё не записанные в базу."""
+    return views(post)
@@ -0,0 +1,161 @@
+from datetime import datetime
+from http import HTTPStatus
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import archive, purge
+from ..models import Comment, Follow, Group, Post, User
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin'
+        )
+        User.objects.bulk_create(
+            User(username=f'user{i}') for i in range(30)
+        )
+        cls.users = list(User.objects.exclude(pk=cls.admin.pk))
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group{i}', description='')
+            for i in range(30)
+        )
+        cls.groups = list(Group.objects.all())
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def fill(self, rows):
+        Post.objects.bulk_create(
+            Post(author=user, group=group, text='Тестовый пост')
+            for user, group in zip(self.users[:rows], self.groups[:rows])
+        )
+        posts = list(Post.objects.all()[:rows])
+        Comment.objects.bulk_create(
+            Comment(author=post.author, post=post, text='Комментарий')
+            for post in posts
+        )
+        Follow.objects.bulk_create(
+            Follow(user=self.admin, author=user)
+            for user in self.users[:rows]
+        )
+
+    def count_queries(self, url):
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_constant_queries_per_page(self):
+        urls = [
+            reverse('admin:posts_post_changelist'),
+            reverse('admin:posts_follow_changelist'),
+            reverse('admin:posts_comment_changelist'),
+            reverse('admin:posts_group_changelist'),
+        ]
+        self.fill(3)
+        few = [self.count_queries(url) for url in urls]
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        cache.clear()
+        self.fill(30)
+        many = [self.count_queries(url) for url in urls]
+        self.assertEqual(few, many)
+
+    def test_months_from_archive_buckets(self):
+        self.fill(3)
+        old = Post.objects.first()
+        Post.objects.filter(pk=old.pk).update(
+            pub_date=timezone.make_aware(datetime(2020, 5, 17))
+        )
+        archive.rebuild()
+        url = reverse('admin:posts_post_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(any(
+            'trunc' in query['sql'] for query in queries.captured_queries
+        ))
+        self.assertContains(response, '2020-05 (1)')
+        response = self.client.get(url, {'month': '2020-05'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [old]
+        )
+
+    def test_post_form_has_no_user_dropdown(self):
+        post = Post.objects.create(author=self.admin, text='Тестовый пост')
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=[post.pk])
+        )
+        self.assertNotContains(response, f'>{self.users[-1].username}<')
+
+
+class AdminModerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='admin'
+        )
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.group = Group.objects.create(
+            title='Спам', slug='spam', description=''
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        Post.objects.bulk_create(
+            Post(author=self.spammer, text=f'Спам {i}') for i in range(5)
+        )
+
+    def run_action(self, action, ids, **data):
+        return self.client.post(reverse('admin:posts_post_changelist'), {
+            'action': action,
+            '_selected_action': ids,
+            **data,
+        })
+
+    def test_move_to_group(self):
+        ids = list(Post.objects.values_list('pk', flat=True)[:2])
+        self.run_action('move_to_group', ids, group='spam')
+        self.assertEqual(
+            set(self.group.posts.values_list('pk', flat=True)), set(ids)
+        )
+
+    def test_delete_authors_posts(self):
+        post = Post.objects.first()
+        Comment.objects.create(author=self.admin, post=post, text='Ответ')
+        response = self.run_action('delete_authors_posts', [post.pk])
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Да, удалить')
+        self.assertIn(('posts', 5), response.context['model_count'])
+        self.assertEqual(Post.objects.count(), 5)
+
+        self.run_action('delete_authors_posts', [post.pk], post='yes')
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(Comment.objects.exists())
+
+    def test_bulk_delete_sends_no_comment_signals(self):
+        post = Post.objects.first()
+        Comment.objects.bulk_create(
+            Comment(author=self.admin, post=post, text=f'Ответ {i}')
+            for i in range(3)
+        )
+        with mock.patch('posts.signals.purge.schedule') as schedule:
+            self.run_action('bulk_delete_posts', [post.pk], post='yes')
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(any(
+            call.args == (purge.post_key(post.pk),)
+            for call in schedule.call_args_list
+        ))
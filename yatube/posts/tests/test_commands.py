@@ -0,0 +1,381 @@
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.models import KVStore
+
+from .. import archive
+from ..models import (Activity, ArchiveBucket, Comment, DigestWatermark,
+                      Follow, Group, Mention, Post, PostFingerprint, PostTag,
+                      Recommendation, User)
+
+TEMP_EMAIL_PATH = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class BuildRecommendationsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.neighbour = User.objects.create_user(username='neighbour')
+        cls.common = User.objects.create_user(username='common')
+        cls.suggested = User.objects.create_user(username='suggested')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.bulk_create([
+            Follow(user=cls.user, author=cls.common),
+            Follow(user=cls.neighbour, author=cls.common),
+            Follow(user=cls.neighbour, author=cls.suggested),
+            Follow(user=cls.neighbour, author=cls.user),
+            Follow(user=cls.other, author=cls.other),
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_co_follow_suggestions(self):
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertEqual(
+            list(self.user.recommendations.values_list(
+                'author__username', 'score'
+            )),
+            [('suggested', 1)],
+        )
+        self.assertFalse(
+            Recommendation.objects.filter(user=self.other).exists()
+        )
+
+    def test_rebuild_replaces_table(self):
+        call_command('build_recommendations', stdout=StringIO())
+        Follow.objects.filter(user=self.neighbour).delete()
+        call_command('build_recommendations', stdout=StringIO())
+        self.assertFalse(self.user.recommendations.exists())
+
+    def test_suggestions_in_context(self):
+        call_command('build_recommendations', stdout=StringIO())
+        client = Client()
+        client.force_login(self.user)
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', args=[self.common.username]),
+        ):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertEqual(
+                    [r.author for r in response.context['recommendations']],
+                    [self.suggested],
+                )
+
+    def test_followed_authors_not_suggested(self):
+        call_command('build_recommendations', stdout=StringIO())
+        Recommendation.objects.create(
+            user=self.user, author=self.user, score=1
+        )
+        Follow.objects.create(user=self.user, author=self.suggested)
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['recommendations']), [])
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.filebased.EmailBackend',
+    EMAIL_FILE_PATH=TEMP_EMAIL_PATH,
+)
+class SendDigestsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        first = User.objects.create_user(username='first')
+        second = User.objects.create_user(username='second')
+        cls.followers = [
+            User.objects.create_user(
+                username=f'reader{i}', email=f'reader{i}@yatube.ru'
+            )
+            for i in range(5)
+        ]
+        silent = User.objects.create_user(username='silent')
+        Follow.objects.bulk_create(
+            [Follow(user=user, author=first) for user in cls.followers]
+            + [Follow(user=cls.followers[0], author=second),
+               Follow(user=silent, author=first)]
+        )
+        Post.objects.create(author=first, text='Пост первого автора')
+        Post.objects.create(author=second, text='Пост второго автора')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_EMAIL_PATH, ignore_errors=True)
+
+    def setUp(self):
+        for name in os.listdir(TEMP_EMAIL_PATH):
+            os.remove(os.path.join(TEMP_EMAIL_PATH, name))
+
+    def test_digest_sent_over_one_connection(self):
+        out = StringIO()
+        call_command('send_digests', stdout=out)
+        self.assertIn('Писем: 5, вариантов: 2', out.getvalue())
+        files = os.listdir(TEMP_EMAIL_PATH)
+        self.assertEqual(len(files), 1)
+        with open(os.path.join(TEMP_EMAIL_PATH, files[0])) as mailbox:
+            content = mailbox.read()
+        self.assertEqual(content.count('reader'), 5)
+        self.assertEqual(content.count('Пост второго автора'), 1)
+
+    def test_old_posts_skipped(self):
+        Post.objects.update(pub_date=timezone.now() - timedelta(days=1))
+        out = StringIO()
+        call_command('send_digests', stdout=out)
+        self.assertIn('Писем: 0', out.getvalue())
+
+    def test_links_absolute(self):
+        call_command('send_digests', stdout=StringIO())
+        post = Post.objects.get(text='Пост второго автора')
+        url = settings.SITE_URL + reverse('posts:post_detail', args=[post.pk])
+        files = os.listdir(TEMP_EMAIL_PATH)
+        with open(os.path.join(TEMP_EMAIL_PATH, files[0])) as mailbox:
+            self.assertIn(url, mailbox.read())
+
+    def test_runs_continue_from_watermark(self):
+        call_command('send_digests', stdout=StringIO())
+        out = StringIO()
+        call_command('send_digests', stdout=out)
+        self.assertIn('Писем: 0', out.getvalue())
+
+        # Запуск опоздал на сутки: посты до него всё равно уходят.
+        DigestWatermark.objects.update(
+            sent_until=timezone.now() - timedelta(days=2)
+        )
+        Post.objects.update(pub_date=timezone.now() - timedelta(days=1))
+        out = StringIO()
+        call_command('send_digests', stdout=out)
+        self.assertIn('Писем: 5', out.getvalue())
+
+
+class ModerateTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.spammer = User.objects.create_user(username='spammer')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description=''
+        )
+
+    def setUp(self):
+        self.post = Post.objects.create(author=self.user, text='Пост')
+        for i in range(3):
+            Post.objects.create(author=self.spammer, text=f'Спам {i}')
+        self.comment = Comment.objects.create(
+            author=self.user, post=self.post, text='Комментарий'
+        )
+
+    def assert_archive_consistent(self):
+        counts = sorted(ArchiveBucket.objects.exclude(count=0).values_list(
+            'scope', 'object_id', 'year', 'month', 'day', 'count'
+        ))
+        archive.rebuild()
+        self.assertEqual(counts, sorted(ArchiveBucket.objects.values_list(
+            'scope', 'object_id', 'year', 'month', 'day', 'count'
+        )))
+
+    def test_move(self):
+        out = StringIO()
+        call_command(
+            'moderate', 'move', '--group', 'test-slug', '--author', 'spammer',
+            stdout=out,
+        )
+        self.assertIn('Перенесено постов: 3', out.getvalue())
+        self.assertEqual(self.group.posts.count(), 3)
+        self.assert_archive_consistent()
+
+    def test_move_requires_filter(self):
+        Post.objects.update(group=self.group)
+        with self.assertRaises(CommandError):
+            call_command('moderate', 'move', stdout=StringIO())
+        self.assertFalse(Post.objects.filter(group=None).exists())
+
+    def test_delete_author_cascades(self):
+        spam = Post.objects.filter(author=self.spammer).first()
+        Comment.objects.create(author=self.user, post=spam, text='Ответ')
+        out = StringIO()
+        call_command('moderate', 'delete-author', 'spammer', stdout=out)
+        self.assertIn('Удалено постов: 3', out.getvalue())
+        self.assertEqual(list(Post.objects.all()), [self.post])
+        self.assertEqual(list(Comment.objects.all()), [self.comment])
+        self.assertFalse(
+            Activity.objects.exclude(post=self.post).exists()
+        )
+        self.assert_archive_consistent()
+
+    def test_purge_comments(self):
+        old = Comment.objects.create(
+            author=self.user, post=self.post, text='Старый'
+        )
+        Comment.objects.filter(pk=old.pk).update(
+            created=timezone.now() - timedelta(days=10)
+        )
+        since = (timezone.now() - timedelta(days=11)).strftime('%Y-%m-%d')
+        until = (timezone.now() - timedelta(days=5)).strftime('%Y-%m-%d')
+        out = StringIO()
+        call_command('moderate', 'purge-comments', since, until, stdout=out)
+        self.assertIn('Удалено комментариев: 1', out.getvalue())
+        self.assertEqual(list(Comment.objects.all()), [self.comment])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GcMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Кеш kvstore sorl переживает откат транзакции теста.
+        cache.clear()
+        self.kept = self.create_post('kept.gif')
+        orphan = self.create_post('orphan.gif')
+        self.kept_thumbnail = get_thumbnail(self.kept.image, '10x10').name
+        self.orphan_thumbnail = get_thumbnail(orphan.image, '10x10').name
+        self.orphan_image = orphan.image.name
+        orphan.delete()
+        for path in self.files():
+            os.utime(os.path.join(TEMP_MEDIA_ROOT, path), (0, 0))
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        os.makedirs(TEMP_MEDIA_ROOT)
+
+    def create_post(self, name):
+        # Разные байты палитры — разное содержимое, иначе файлы совпадут.
+        content = SMALL_GIF.replace(b'\xFF\xFF\xFF', name[:3].encode())
+        return Post.objects.create(
+            author=self.user, text='Пост',
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def files(self):
+        return {
+            os.path.relpath(os.path.join(path, name), TEMP_MEDIA_ROOT)
+            for path, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names
+        }
+
+    def test_dry_run(self):
+        before = self.files()
+        out = StringIO()
+        call_command('gc_media', dry_run=True, stdout=out)
+        self.assertEqual(self.files(), before)
+        self.assertIn(f'image: {self.orphan_image}', out.getvalue())
+        self.assertIn('Миниатюр найдено: 1', out.getvalue())
+
+    def test_orphans_removed(self):
+        keys = KVStore.objects.count()
+        call_command('gc_media', stdout=StringIO())
+        self.assertEqual(
+            self.files(), {self.kept.image.name, self.kept_thumbnail}
+        )
+        self.assertEqual(KVStore.objects.count(), keys - 3)
+
+    def test_quarantine(self):
+        target = os.path.join(TEMP_MEDIA_ROOT, 'quarantine')
+        call_command('gc_media', quarantine=target, stdout=StringIO())
+        self.assertTrue(
+            os.path.exists(os.path.join(target, self.orphan_image))
+        )
+
+    def test_young_files_kept(self):
+        Post.objects.all().delete()
+        fresh = self.create_post('fresh.gif')
+        fresh.delete()
+        call_command('gc_media', stdout=StringIO())
+        self.assertEqual(self.files(), {fresh.image.name})
+
+
+class FollowFeedBenchmarkTest(TestCase):
+
+    def test_report(self):
+        out = StringIO()
+        call_command(
+            'follow_feed_benchmark', authors=20, posts=5, follows='1,5,15',
+            runs=2, stdout=out,
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual([row['follows'] for row in report], [1, 5, 15])
+        self.assertTrue(all(row['same_page'] for row in report))
+        self.assertFalse(User.objects.filter(
+            username__startswith='feedbench'
+        ).exists())
+
+
+class IndexHashtagsTest(TestCase):
+
+    def test_backfill(self):
+        author = User.objects.create_user(username='auth')
+        User.objects.create_user(username='reader')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Пост {i} #тег{i % 3} @reader')
+            for i in range(7)
+        )
+        call_command('index_hashtags', chunk_size=3, stdout=StringIO())
+        call_command('index_hashtags', stdout=StringIO())
+        self.assertEqual(PostTag.objects.count(), 7)
+        self.assertEqual(
+            PostTag.objects.filter(tag__name='тег0').count(), 3
+        )
+        self.assertEqual(
+            Mention.objects.filter(user__username='reader').count(), 7
+        )
+
+
+class ClusterDuplicatesTest(TestCase):
+
+    def test_clusters(self):
+        author = User.objects.create_user(username='auth')
+        spam = 'Купите дешёвые часы со скидкой 90% сегодня на best.example'
+        Post.objects.bulk_create(
+            [Post(author=author, text=spam.replace('90', str(90 - i)))
+             for i in range(4)]
+            + [Post(author=author, text=text) for text in (
+                'Сегодня гулял в парке и видел уток',
+                'Дочитал роман, финал оказался неожиданным',
+                'Рецепт пирога с яблоками и корицей',
+            )]
+        )
+        pks = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        out = StringIO()
+        call_command('cluster_duplicates', flag=True, stdout=out)
+        self.assertIn(' '.join(map(str, pks[:4])), out.getvalue())
+        self.assertIn('Групп почти-дубликатов: 1', out.getvalue())
+        self.assertEqual(PostFingerprint.objects.count(), 7)
+        self.assertEqual(
+            list(PostFingerprint.objects.filter(
+                duplicate_of=pks[0]
+            ).values_list('post_id', flat=True).order_by('post_id')),
+            pks[1:4],
+        )
@@ -1,12 +1,21 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from unittest import mock
 
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import connection
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Comment, Group, Post, User
+from .. import duplicates
+from ..models import Comment, Group, Post, PostFingerprint, StoredImage, User
+from ..storage import ContentHashStorage
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -66,11 +75,12 @@ class PostCreateFormTests(TestCase):
         self.assertRedirects(response, reverse('posts:profile',
                              kwargs={'username': self.owner.username}))
         self.assertEqual(Post.objects.count(), post_count + 1)
+        digest = hashlib.sha256(self.small_gif).hexdigest()
         self.assertTrue(
             Post.objects.filter(
                 text=form_data['text'],
                 group=self.group,
-                image='posts/small.gif'
+                image=f'posts/{digest[:2]}/{digest}.gif'
             ).exists()
         )
 
@@ -173,3 +183,151 @@ class CommentCreateFormTests(TestCase):
         self.assertRedirects(response, '/auth/login/?next='
                              + url)
         self.assertEqual(self.post.comments.count(), count)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageStorageTest(TransactionTestCase):
+    small_gif = (
+        b'\x47\x49\x46\x38\x39\x61\x02\x00'
+        b'\x01\x00\x80\x00\x00\x00\x00\x00'
+        b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+        b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+        b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+        b'\x0A\x00\x3B'
+    )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='auth')
+        self.client = Client()
+        self.client.force_login(self.owner)
+
+    def upload(self, name):
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Тестовый текст',
+            'image': SimpleUploadedFile(name, self.small_gif, 'image/gif'),
+        })
+        return Post.objects.latest('pk')
+
+    def test_identical_uploads_share_file(self):
+        first = self.upload('small.gif')
+        second = self.upload('copy.gif')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(first.image.path))), 1
+        )
+        self.assertEqual(StoredImage.objects.get().refs, 2)
+
+    def test_racing_identical_save(self):
+        storage = ContentHashStorage(location=TEMP_MEDIA_ROOT)
+        name = storage.save('posts/small.gif', ContentFile(self.small_gif))
+        # Параллельная загрузка не увидела файл и тоже пишет его.
+        with mock.patch('os.path.exists', return_value=False):
+            again = storage.save('posts/copy.gif', ContentFile(self.small_gif))
+        self.assertEqual(again, name)
+        self.assertEqual(os.listdir(os.path.dirname(storage.path(name))), [
+            os.path.basename(name)
+        ])
+
+    def test_save_without_hard_links(self):
+        storage = ContentHashStorage(location=TEMP_MEDIA_ROOT)
+        with mock.patch('os.link', side_effect=PermissionError):
+            name = storage.save('posts/small.gif', ContentFile(self.small_gif))
+        with open(storage.path(name), 'rb') as image:
+            self.assertEqual(image.read(), self.small_gif)
+        self.assertEqual(os.listdir(os.path.dirname(storage.path(name))), [
+            os.path.basename(name)
+        ])
+
+    def test_file_deleted_with_last_reference(self):
+        first = self.upload('small.gif')
+        second = self.upload('copy.gif')
+        first.delete()
+        self.assertTrue(os.path.exists(second.image.path))
+        second.delete()
+        self.assertFalse(os.path.exists(second.image.path))
+        self.assertFalse(StoredImage.objects.exists())
+
+
+SPAM = (
+    'Купите дешёвые часы со скидкой 90% только сегодня на сайте '
+    'best-watches.example, доставка бесплатно!'
+)
+
+
+class NearDuplicateTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.original = Post.objects.create(author=cls.user, text=SPAM)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def duplicate_of(self, text):
+        post = Post.objects.create(author=self.user, text=text)
+        return PostFingerprint.objects.get(post=post).duplicate_of_id
+
+    def test_variations_flagged(self):
+        for text in (
+            SPAM.replace('90%', '85%'),
+            SPAM.replace('сегодня', 'сейчас'),
+            SPAM.upper() + ' !!!',
+        ):
+            with self.subTest(text=text):
+                self.assertEqual(self.duplicate_of(text), self.original.pk)
+        for text in (
+            'Сегодня гулял в парке, видел уток и красивый закат над рекой.',
+            'Купите дешёвые сумки со скидкой 70% на сайте bags.example',
+        ):
+            with self.subTest(text=text):
+                self.assertIsNone(self.duplicate_of(text))
+
+    def test_lookup_is_one_query(self):
+        sig = duplicates.signature(SPAM.replace('часы', 'часики'))
+        with self.assertNumQueries(1):
+            found = duplicates.find_duplicate(sig)
+        self.assertEqual(found, self.original.pk)
+
+    @override_settings(NEAR_DUPLICATE_ACTION='reject')
+    def test_short_texts_not_compared(self):
+        other = Client()
+        other.force_login(User.objects.create_user(username='other'))
+        for client in (self.client, other, other):
+            for text in ('Спасибо!', '!!!'):
+                client.post(reverse('posts:post_create'), {'text': text})
+        self.assertEqual(Post.objects.filter(text='Спасибо!').count(), 3)
+        self.assertEqual(Post.objects.filter(text='!!!').count(), 3)
+        self.assertEqual(PostFingerprint.objects.count(), 1)
+
+    def test_candidates_limited(self):
+        for _ in range(5):
+            Post.objects.create(author=self.user, text=SPAM)
+        with mock.patch('posts.duplicates.MAX_CANDIDATES', 3), \
+                CaptureQueriesContext(connection) as queries:
+            found = duplicates.find_duplicate(duplicates.signature(SPAM))
+        self.assertEqual(found, self.original.pk)
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+
+    @override_settings(NEAR_DUPLICATE_ACTION='reject')
+    def test_reject(self):
+        response = self.client.post(
+            reverse('posts:post_create'),
+            {'text': SPAM.replace('90%', '95%')},
+        )
+        self.assertFormError(
+            response, 'form', 'text', 'Почти такой же пост уже опубликован'
+        )
+        self.assertEqual(Post.objects.count(), 1)
+        response = self.client.post(
+            reverse('posts:post_edit', args=[self.original.pk]),
+            {'text': SPAM + ' Звоните!'},
+        )
+        self.original.refresh_from_db()
+        self.assertTrue(self.original.text.endswith('Звоните!'))
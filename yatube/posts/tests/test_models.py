@@ -1,6 +1,11 @@
+import statistics
+import time
+from unittest import mock
+
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from .. import autocomplete, hashtags
+from ..models import Group, Mention, Post, PostTag, User
 
 
 class PostModelTest(TestCase):
@@ -23,3 +28,87 @@ class PostModelTest(TestCase):
         """Проверяем, что у моделей корректно работает __str__."""
         self.assertEqual(self.group.title, str(self.group))
         self.assertEqual(self.post.text[:15], str(self.post))
+
+
+class HashtagIndexTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.friend = User.objects.create_user(username='friend.one')
+
+    def index(self, post):
+        return (
+            set(PostTag.objects.filter(post=post).values_list(
+                'tag__name', flat=True
+            )),
+            set(Mention.objects.filter(post=post).values_list(
+                'user__username', flat=True
+            )),
+        )
+
+    def test_parse(self):
+        self.assertEqual(
+            hashtags.parse(
+                'Про #Django и #джанго, привет @friend.one. '
+                'Почта a@b.ru, C#, #' + 'x' * 51
+            ),
+            ({'django', 'джанго'}, {'friend.one'}),
+        )
+
+    def test_index_follows_text(self):
+        post = Post.objects.create(
+            author=self.author, text='#Один #два @friend.one @auth @nobody'
+        )
+        self.assertEqual(self.index(post), ({'один', 'два'}, {'friend.one'}))
+        post.text = '#два #три'
+        post.save()
+        self.assertEqual(self.index(post), ({'два', 'три'}, set()))
+
+
+class PrefixIndexTest(TestCase):
+
+    def test_search_and_updates(self):
+        index = autocomplete.PrefixIndex([
+            (key, autocomplete.ref(autocomplete.USER, 1))
+            for key in autocomplete.user_keys('ivan', 'Иван', 'Петров')
+        ])
+        group = autocomplete.ref(autocomplete.GROUP, 1)
+        self.assertEqual(index.search('ПЕТ'), [2])
+        self.assertEqual(index.search('иван п'), [2])
+        self.assertEqual(index.search('iv'), [2])
+        self.assertEqual(index.search(''), [])
+
+        with mock.patch('posts.autocomplete.COMPACT_THRESHOLD', 3):
+            index.update(group, autocomplete.group_keys('Коты', 'cats'))
+            self.assertEqual(index.search('ко'), [group])
+            index.update(2, autocomplete.user_keys('ivan', 'Иван', 'Котов'))
+            self.assertEqual(index.search('ко'), [2, group])
+            self.assertEqual(index.search('пет'), [])
+            index.remove(group)
+            self.assertEqual(index.search('ко'), [2])
+        self.assertEqual(index.delta, [])
+
+    def test_footprint_and_speed(self):
+        names = ['Иван Петров', 'Анна Смирнова', 'Олег Кузнецов']
+        users = [
+            (autocomplete.ref(autocomplete.USER, pk),
+             (f'user{pk}', *f'{names[pk % 3]}{pk % 100}'.split()))
+            for pk in range(1, 20001)
+        ]
+        index = autocomplete.PrefixIndex(
+            ((key, value) for value, fields in users
+             for key in autocomplete.user_keys(*fields)),
+            ((value, autocomplete.user_display(*fields))
+             for value, fields in users),
+        )
+        self.assertLess(
+            index.memory() / len(index), autocomplete.BYTES_PER_KEY_TARGET
+        )
+        timings = []
+        for prefix in ('user1', 'ива', 'смирнова5', 'нет такого') * 50:
+            started = time.perf_counter()
+            index.search(prefix)
+            timings.append(time.perf_counter() - started)
+        self.assertLess(statistics.median(timings), 0.0005)
@@ -1,14 +1,29 @@
+import hashlib
 import shutil
 import tempfile
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models.query import QuerySet
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 
-from ..models import Follow, Group, Post, User
+from .. import archive, autocomplete, counters, sitemaps, trending
+from ..follows import following_ids
+from ..models import (Activity, ArchiveBucket, Comment, FeedWatermark, Follow,
+                      Group, Post, User)
+from ..utils import feed_cursor
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -37,6 +52,8 @@ class PostPagesTest(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        digest = hashlib.sha256(cls.small_gif).hexdigest()
+        cls.image_name = f'posts/{digest[:2]}/{digest}.gif'
         uploaded = SimpleUploadedFile(
             name='small.gif',
             content=cls.small_gif,
@@ -133,7 +150,7 @@ class PostPagesTest(TestCase):
         self.assertEqual(post.text, 'Тестовый пост')
         self.assertEqual(post.author.pk, self.owner.pk)
         self.assertEqual(post.group.pk, self.group.pk)
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertEqual(post.image, self.image_name)
 
     def _test_form_correct_context(self, response):
         form_fields = {
@@ -189,6 +206,36 @@ class PostPaginatorTest(TestCase):
                 response = self.owner_client.get(page + '?page=2')
                 self.assertEqual(len(response.context['page_obj']), 3)
 
+    def test_feeds_skip_count(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=['test_slug']),
+            reverse('posts:profile', args=['auth']),
+            reverse('posts:follow_index'),
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    self.owner_client.get(url)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if 'COUNT(' in query['sql']
+                    and '"posts_post"' in query['sql']
+                ])
+
+    def test_lookahead_pages(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.owner)
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:follow_index')
+        first = client.get(url).context['page_obj']
+        self.assertEqual((len(first), first.has_next()), (10, True))
+        last = client.get(url + '?page=2').context['page_obj']
+        self.assertEqual((len(last), last.has_next()), (3, False))
+        response = client.get(url + '?page=5')
+        self.assertEqual(response.context['page_obj'].number, 2)
+
 
 class FollowTest(TestCase):
 
@@ -229,6 +276,59 @@ class FollowTest(TestCase):
                 author=self.author, user=self.user).exists()
         )
 
+    def test_follow_idempotent(self):
+        Follow.objects.all().delete()
+        url = reverse('posts:profile_follow', args=[self.author])
+        self.authorized_client.get(url)
+        self.authorized_client.get(url)
+        self.assertEqual(
+            Follow.objects.filter(author=self.author, user=self.user).count(),
+            1
+        )
+
+    def test_cannot_follow_self(self):
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.user])
+        )
+        self.assertFalse(Follow.objects.filter(author=self.user).exists())
+
+    def test_following_set_updated_in_place(self):
+        Follow.objects.all().delete()
+        cache.clear()
+        self.assertEqual(following_ids(self.user), set())
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author])
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(following_ids(self.user), {self.author.pk})
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author])
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(following_ids(self.user), set())
+
+    def test_follow_state_in_templates(self):
+        Follow.objects.all().delete()
+        cache.clear()
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=[self.author])
+        )
+        self.assertTrue(response.context['following'])
+        self.assertIn(self.author.pk, response.context['following_ids'])
+        self.assertContains(response, 'Вы подписаны')
+
+    def test_follow_badge_not_shared_through_cache(self):
+        Follow.objects.all().delete()
+        cache.clear()
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Вы подписаны')
+        stranger = Client()
+        stranger.force_login(User.objects.create_user(username='stranger'))
+        response = stranger.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Вы подписаны')
+
     def test_new_post_for_follower(self):
         Follow.objects.all().delete()
         Follow.objects.create(
@@ -278,3 +378,799 @@ class CacheTest(TestCase):
             reverse('posts:index')
         )
         self.assertNotEqual(posts, response.content)
+
+
+class TrendingTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.quiet = Post.objects.create(
+            author=cls.author,
+            text='Тихий пост',
+        )
+        cls.popular = Post.objects.create(
+            author=cls.author,
+            text='Популярный пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_comments_fill_current_bucket(self):
+        Comment.objects.create(
+            author=self.author, post=self.popular, text='Комментарий'
+        )
+        Comment.objects.create(
+            author=self.author, post=self.popular, text='Комментарий'
+        )
+        activity = Activity.objects.get(post=self.popular)
+        self.assertEqual(activity.bucket, trending.current_bucket())
+        self.assertEqual(activity.comments, 2)
+
+    def test_trending_order_and_groups(self):
+        Comment.objects.create(
+            author=self.author, post=self.popular, text='Комментарий'
+        )
+        trending.record(self.quiet.pk, views=1)
+        response = self.client.get(reverse('posts:trending'))
+        data = response.context['trending']
+        self.assertEqual(data['posts'], [self.popular, self.quiet])
+        self.assertEqual(data['groups'], [self.group])
+
+    def test_old_activity_decays(self):
+        now = trending.current_bucket()
+        Activity.objects.create(
+            post=self.popular,
+            bucket=now - trending.HALF_LIFE_BUCKETS * 4,
+            views=10,
+        )
+        Activity.objects.create(post=self.quiet, bucket=now, views=1)
+        self.assertEqual(
+            trending.trending()['posts'], [self.quiet, self.popular]
+        )
+
+    def test_served_from_cache(self):
+        trending.record(self.quiet.pk, views=1)
+        trending.trending()
+        with self.assertNumQueries(0):
+            self.assertEqual(trending.trending()['posts'], [self.quiet])
+
+
+class CommentsPaginationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+        )
+        Comment.objects.bulk_create(
+            Comment(author=cls.author, post=cls.post, text=str(i))
+            for i in range(25)
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_first_batch_inline(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, '24')
+        self.assertEqual(response.context['next_cursor'], comments[-1].pk)
+
+    def test_next_batch_fragment(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        with self.assertNumQueries(1):
+            fragment = self.client.get(
+                url, {'cursor': response.context['next_cursor']}
+            )
+        self.assertTemplateNotUsed(fragment, 'base.html')
+        self.assertEqual(
+            [comment.text for comment in fragment.context['comments']],
+            ['4', '3', '2', '1', '0'],
+        )
+        self.assertIsNone(fragment.context['next_cursor'])
+
+
+class ArchiveTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='another_test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        Post.objects.create(author=cls.author, text='Без группы')
+        cls.today = timezone.localdate()
+
+    def setUp(self):
+        self.client = Client()
+
+    def count(self, scope, object_id, month=0, day=0):
+        return ArchiveBucket.objects.get(
+            scope=scope, object_id=object_id,
+            year=self.today.year, month=month, day=day,
+        ).count
+
+    def test_counters_follow_posts(self):
+        self.assertEqual(self.count(ArchiveBucket.SITE, 0), 2)
+        self.assertEqual(
+            self.count(ArchiveBucket.AUTHOR, self.author.pk,
+                       self.today.month, self.today.day),
+            2
+        )
+        self.assertEqual(self.count(ArchiveBucket.GROUP, self.group.pk), 1)
+
+        self.post.group = self.other_group
+        self.post.save()
+        self.assertEqual(self.count(ArchiveBucket.GROUP, self.group.pk), 0)
+        self.assertEqual(
+            self.count(ArchiveBucket.GROUP, self.other_group.pk), 1
+        )
+
+        self.post.delete()
+        self.assertEqual(self.count(ArchiveBucket.SITE, 0), 1)
+        self.assertEqual(
+            self.count(ArchiveBucket.GROUP, self.other_group.pk), 0
+        )
+
+    def test_rebuild_matches_signals(self):
+        expected = set(ArchiveBucket.objects.values_list(
+            'scope', 'object_id', 'year', 'month', 'day', 'count'
+        ))
+        call_command('rebuild_archive', stdout=StringIO())
+        self.assertEqual(
+            set(ArchiveBucket.objects.values_list(
+                'scope', 'object_id', 'year', 'month', 'day', 'count'
+            )),
+            expected,
+        )
+
+    def test_archive_pages(self):
+        date = (self.today.year, self.today.month, self.today.day)
+        urls = {
+            reverse('posts:archive', args=date[:1]): 2,
+            reverse('posts:archive', args=date[:2]): 2,
+            reverse('posts:archive', args=date): 2,
+            reverse('posts:group_archive',
+                    args=[self.group.slug, *date[:2]]): 1,
+            reverse('posts:profile_archive',
+                    args=[self.author.username, *date]): 2,
+        }
+        for url, count in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(len(response.context['page_obj']), count)
+                self.assertEqual(
+                    response.context['navigation']['years'][0]['count'],
+                    count,
+                )
+
+    def test_empty_and_invalid_dates(self):
+        response = self.client.get(
+            reverse('posts:archive', args=[self.today.year - 1])
+        )
+        self.assertEqual(len(response.context['page_obj']), 0)
+        response = self.client.get('/archive/2022/13/')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_date_range(self):
+        start, end = archive.date_range(2022, 12)
+        self.assertEqual((start.month, end.year, end.month), (12, 2023, 1))
+
+
+@mock.patch('posts.sitemaps.SITEMAP_SIZE', 2)
+class SitemapTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        User.objects.create_user(username='silent')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description=''
+        )
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}',
+                                group=cls.group if i == 0 else None)
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_index_lists_chunks(self):
+        content = self.content(self.client.get(reverse('posts:sitemap_index')))
+        chunks = {
+            reverse('posts:sitemap', args=[section, chunk])
+            for section, chunk, _ in sitemaps.index_entries()
+        }
+        self.assertGreaterEqual(len(chunks), 4)
+        for url in chunks:
+            self.assertIn(f'http://testserver{url}', content)
+
+    def test_chunks_cover_all_urls(self):
+        urls = ''.join(
+            self.content(self.client.get(
+                reverse('posts:sitemap', args=[section, chunk])
+            ))
+            for section, chunk, _ in sitemaps.index_entries()
+        )
+        for post in self.posts:
+            self.assertEqual(urls.count(
+                reverse('posts:post_detail', args=[post.pk]) + '<'
+            ), 1)
+        self.assertIn(reverse('posts:group_posts', args=['test_slug']), urls)
+        self.assertIn(reverse('posts:profile', args=['author']), urls)
+        self.assertNotIn('silent', urls)
+
+    def test_unchanged_chunk_not_modified(self):
+        section, chunk, lastmod = sitemaps.index_entries()[0]
+        url = reverse('posts:sitemap', args=[section, chunk])
+        response = self.client.get(url)
+        self.assertEqual(response['Last-Modified'], http_date(
+            lastmod.timestamp()
+        ))
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_delete_and_rename_modify_chunk(self):
+        post = self.posts[-1]
+        chunk = post.pk // sitemaps.SITEMAP_SIZE
+        url = reverse('posts:sitemap', args=['posts', chunk])
+        first = self.client.get(url)['Last-Modified']
+        with self.assertNumQueries(0):
+            sitemaps.chunk_lastmod('posts', chunk)
+        later = timezone.now() + timedelta(days=1)
+        with mock.patch('posts.sitemaps.timezone.now', return_value=later):
+            Post.objects.filter(pk=post.pk).delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+        chunk = self.group.pk // sitemaps.SITEMAP_SIZE
+        url = reverse('posts:sitemap', args=['groups', chunk])
+        first = self.client.get(url)['Last-Modified']
+        later += timedelta(days=1)
+        with mock.patch('posts.sitemaps.timezone.now', return_value=later):
+            group = Group.objects.get(pk=self.group.pk)
+            group.slug = 'renamed'
+            group.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('renamed', self.content(response))
+
+    def test_unknown_section(self):
+        response = self.client.get(reverse('posts:sitemap', args=['x', 0]))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class FeedFragmentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test_slug', description=''
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_fragments_continue_feeds(self):
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.author)
+        client = Client()
+        client.force_login(reader)
+        for page, fragment in (
+            ('posts:index', 'posts:index_fragment'),
+            ('posts:group_posts', 'posts:group_fragment'),
+            ('posts:profile', 'posts:profile_fragment'),
+            ('posts:follow_index', 'posts:follow_fragment'),
+        ):
+            with self.subTest(page=page):
+                args = {
+                    'posts:group_posts': ['test_slug'],
+                    'posts:profile': ['auth'],
+                }.get(page, [])
+                response = client.get(reverse(page, args=args))
+                cursor = feed_cursor(self.posts[-10])
+                self.assertContains(response, f'fragment/?cursor={cursor}"')
+                response = client.get(
+                    reverse(fragment, args=args), {'cursor': cursor}
+                )
+                self.assertTemplateNotUsed(response, 'base.html')
+                self.assertEqual(
+                    [post.text for post in response.context['posts']],
+                    [f'Пост {i}' for i in range(14, 4, -1)],
+                )
+                last = client.get(
+                    reverse(fragment, args=args),
+                    {'cursor': response.context['next_cursor']},
+                )
+                self.assertEqual(len(last.context['posts']), 5)
+                self.assertNotContains(last, 'Показать ещё')
+
+    def test_anonymous_fragment_cached(self):
+        url = reverse('posts:index_fragment')
+        cursor = feed_cursor(self.posts[-10])
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, {'cursor': cursor})
+        self.assertEqual(cached.content, response.content)
+        # Мусор в курсоре не плодит ключи: это просто начало ленты.
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            junk = self.client.get(url, {'cursor': 'x y\n' * 100})
+        self.assertEqual(junk.content, first.content)
+
+    def test_fragment_follows_publication_order(self):
+        # Пост, опубликованный задним числом, стоит в ленте по дате, а не
+        # по pk: фрагмент продолжает страницу в том же порядке.
+        backdated = Post.objects.create(author=self.author, text='Старый')
+        Post.objects.filter(pk=backdated.pk).update(
+            pub_date=self.posts[7].pub_date - timedelta(microseconds=1)
+        )
+        response = self.client.get(reverse('posts:index'))
+        page = [post.text for post in response.context['page_obj']]
+        response = self.client.get(
+            reverse('posts:index_fragment'),
+            {'cursor': response.context['next_cursor']()},
+        )
+        fragment = [post.text for post in response.context['posts']]
+        self.assertEqual(page + fragment, [
+            *(f'Пост {i}' for i in range(24, 6, -1)), 'Старый', 'Пост 6',
+        ])
+
+    def test_follow_fragment_requires_login(self):
+        response = self.client.get(reverse('posts:follow_fragment'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class FollowMergeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(4)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=cls.reader, author=author) for author in cls.authors
+        )
+        for i in range(30):
+            Post.objects.create(author=cls.authors[i % 3], text=f'Пост {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def joined(self):
+        return [*Post.objects.filter(
+            author__following__user=self.reader
+        ).values_list('pk', flat=True)[:10]]
+
+    def page(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return [post.pk for post in response.context['page_obj']], response
+
+    def test_first_page_merged(self):
+        self.page()
+        with CaptureQueriesContext(connection) as queries:
+            pks, response = self.page()
+        self.assertEqual(pks, self.joined())
+        self.assertTrue(response.context['page_obj'].has_next())
+        self.assertFalse(any(
+            'posts_follow' in query['sql'] and 'posts_post' in query['sql']
+            for query in queries.captured_queries
+        ))
+        second = self.client.get(reverse('posts:follow_index'), {'page': 2})
+        self.assertEqual(
+            [post.text for post in second.context['page_obj']],
+            [f'Пост {i}' for i in range(19, 9, -1)],
+        )
+
+    def test_lists_follow_changes(self):
+        self.page()
+        quiet = Post.objects.create(author=self.authors[3], text='Новый')
+        self.assertEqual(self.page()[0][0], quiet.pk)
+        quiet.text = 'Исправленный'
+        quiet.save()
+        latest = Post.objects.filter(author=self.authors[0]).first()
+        latest.delete()
+        quiet.delete()
+        self.assertEqual(self.page()[0], self.joined())
+
+
+class UnreadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def unread(self):
+        return self.client.get(reverse('posts:unread_count')).json()['unread']
+
+    def test_counts_since_last_visit(self):
+        self.assertEqual(self.unread(), 0)
+        for i in range(2):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+        Post.objects.create(author=self.reader, text='Свой пост')
+        self.assertEqual(self.unread(), 2)
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'data-poll')
+        self.assertEqual(response.context['unread_count'], 2)
+
+        self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(self.unread(), 0)
+        seen = FeedWatermark.objects.get(user=self.reader).seen
+        self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            FeedWatermark.objects.get(user=self.reader).seen, seen
+        )
+
+        Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.unread(), 1)
+
+    def test_publish_independent_of_followers(self):
+        for i in range(5):
+            follower = User.objects.create_user(username=f'follower{i}')
+            Follow.objects.create(user=follower, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(any(
+            'posts_follow' in query['sql']
+            for query in queries.captured_queries
+        ))
+        self.assertEqual(self.unread(), 1)
+
+    def test_poll_not_modified(self):
+        url = reverse('posts:unread_poll')
+        response = self.client.get(url)
+        self.assertEqual(response.json(), {'unread': 0})
+        etag = response['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+        Post.objects.create(author=self.author, text='Новый пост')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json(), {'unread': 1})
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_anonymous_redirected(self):
+        guest = Client()
+        for name in ('posts:unread_count', 'posts:unread_poll'):
+            with self.subTest(name=name):
+                response = guest.get(reverse(name))
+                self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class TagFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.tagged = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i} #Тег для @reader'
+            )
+            for i in range(15)
+        ]
+        Post.objects.create(author=cls.author, text='Без тега, но #другой')
+
+    def test_tag_feed(self):
+        url = reverse('posts:tag_posts', args=['ТЕГ'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse(any(
+            'LIKE' in query['sql'] for query in queries.captured_queries
+        ))
+        self.assertEqual(
+            [post.pk for post in response.context['posts']],
+            [post.pk for post in self.tagged[:4:-1]],
+        )
+        self.assertContains(
+            response, f'href="{reverse("posts:tag_posts", args=["тег"])}"'
+        )
+        last = self.client.get(
+            url, {'cursor': response.context['next_cursor']}
+        )
+        self.assertEqual(
+            [post.pk for post in last.context['posts']],
+            [post.pk for post in self.tagged[4::-1]],
+        )
+        missing = self.client.get(reverse('posts:tag_posts', args=['нет']))
+        self.assertEqual(missing.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_mentions(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual(len(response.context['posts']), 10)
+        self.client.force_login(self.author)
+        response = self.client.get(reverse('posts:mentions'))
+        self.assertEqual(response.context['posts'], [])
+
+
+class SuggestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='ivanov', first_name='Иван', last_name='Петров'
+        )
+        cls.group = Group.objects.create(
+            title='Любители котиков', slug='cats', description=''
+        )
+
+    def setUp(self):
+        autocomplete.reset()
+
+    def suggest(self, query):
+        response = self.client.get(reverse('posts:suggest'), {'q': query})
+        return [item['url'] for item in response.json()['results']]
+
+    def test_prefixes(self):
+        profile = reverse('posts:profile', args=['ivanov'])
+        group = reverse('posts:group_posts', args=['cats'])
+        for query, urls in (
+            ('iva', [profile]),
+            ('Пет', [profile]),
+            ('иван петров', [profile]),
+            ('кот', [group]),
+            ('ca', [group]),
+            ('', []),
+            ('никто', []),
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.suggest(query), urls)
+
+    def test_suggest_without_queries(self):
+        self.suggest('x')
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('posts:suggest'), {'q': 'Пет'})
+        self.assertEqual(response.json()['results'], [{
+            'type': 'user',
+            'label': 'Иван Петров',
+            'username': 'ivanov',
+            'url': reverse('posts:profile', args=['ivanov']),
+        }])
+
+    def test_signals_update_index(self):
+        self.suggest('x')
+        self.user.last_name = 'Котов'
+        self.user.save()
+        User.objects.create_user(username='kotik')
+        self.group.delete()
+        self.assertEqual(self.suggest('кот'), [
+            reverse('posts:profile', args=['ivanov']),
+        ])
+        self.assertEqual(self.suggest('kot'), [
+            reverse('posts:profile', args=['kotik']),
+        ])
+        self.assertEqual(self.suggest('петр'), [])
+
+    def test_other_process_changes_replayed(self):
+        self.suggest('x')
+        # Другой процесс переименовал автора и завёл группу: сигналы
+        # сработали там, сюда дошёл только журнал в кеше.
+        User.objects.filter(pk=self.user.pk).update(username='sidorov')
+        Group.objects.bulk_create([
+            Group(title='Собаки', slug='dogs', description='')
+        ])
+        group = Group.objects.get(slug='dogs')
+        autocomplete.log_change(
+            autocomplete.ref(autocomplete.USER, self.user.pk)
+        )
+        autocomplete.log_change(autocomplete.ref(autocomplete.GROUP, group.pk))
+        self.assertEqual(self.suggest('sid'), [
+            reverse('posts:profile', args=['sidorov']),
+        ])
+        self.assertEqual(self.suggest('соб'), [
+            reverse('posts:group_posts', args=['dogs']),
+        ])
+        self.assertEqual(self.suggest('iva'), [])
+
+    def test_changes_during_build_kept(self):
+        load_entries = autocomplete.load_entries
+
+        def slow_load_entries():
+            entries = list(load_entries())
+            User.objects.create_user(username='latecomer')
+            return entries
+
+        with mock.patch(
+            'posts.autocomplete.load_entries', slow_load_entries
+        ):
+            self.assertEqual(self.suggest('late'), [
+                reverse('posts:profile', args=['latecomer']),
+            ])
+
+
+class ViewCounterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.other = Post.objects.create(author=cls.author, text='Другой')
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch('posts.counters.buffer', counters.ViewBuffer())
+        self.buffer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def view(self, post):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        return response.content.decode()
+
+    def post_updates(self, queries):
+        return [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+
+    def test_views_buffered_and_flushed(self):
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(5):
+                content = self.view(self.post)
+            self.view(self.other)
+            self.view(self.other)
+        self.assertEqual(self.post_updates(queries), [])
+        self.assertFalse(Activity.objects.exists())
+        self.assertIn('Просмотров: <span>5</span>', content)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.buffer.flush(), 7)
+        self.assertEqual(len(self.post_updates(queries)), 2)
+        self.post.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual((self.post.views, self.other.views), (5, 2))
+        self.assertEqual(Activity.objects.get(post=self.post).views, 5)
+        self.assertIn('Просмотров: <span>6</span>', self.view(self.post))
+
+    def test_background_tick_spills_and_flushes(self):
+        self.view(self.post)
+        self.buffer.tick()
+        self.assertEqual(cache.get(counters.pending_key(self.post.pk)), 1)
+        with mock.patch('posts.counters.FLUSH_INTERVAL', 0):
+            self.buffer.tick()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+    def test_concurrent_flushes_count_once(self):
+        other = counters.ViewBuffer()
+        self.buffer.record(self.post.pk, 2)
+        other.record(self.post.pk, 3)
+        other.spill()
+        get_many = counters.cache.get_many
+        raced = []
+
+        def racing_get_many(keys):
+            counts = get_many(keys)
+            # Второй процесс сбрасывает, пока первый прочитал счётчики.
+            if not raced:
+                raced.append(None)
+                raced[0] = other.flush()
+            return counts
+
+        with mock.patch.object(counters.cache, 'get_many', racing_get_many):
+            self.assertEqual(self.buffer.flush(), 5)
+        self.assertEqual(raced, [0])
+        self.assertEqual(other.flush(), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 5)
+        self.assertEqual(cache.get(counters.pending_key(self.post.pk)), 0)
+
+    def test_crash_loses_only_unspilled_views(self):
+        self.buffer.record(self.post.pk, 3)
+        self.buffer.spill()
+        self.buffer.record(self.post.pk, 4)
+        # Процесс упал: его память пропала, счётчик в общем кеше остался.
+        survivor = counters.ViewBuffer()
+        survivor.record(self.post.pk)
+        survivor.flush()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 4)
+
+    def test_failed_existence_query_keeps_views(self):
+        self.buffer.record(self.post.pk, 3)
+        values_list = QuerySet.values_list
+
+        def failing_values_list(queryset, *fields, **kwargs):
+            if queryset.model is Post:
+                raise DatabaseError('база недоступна')
+            return values_list(queryset, *fields, **kwargs)
+
+        with mock.patch.object(QuerySet, 'values_list', failing_values_list):
+            with self.assertRaises(DatabaseError):
+                self.buffer.flush()
+        self.assertEqual(self.buffer.pending(self.post.pk), 3)
+        self.assertEqual(self.buffer.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 3)
+
+    def test_trending_written_in_bulk(self):
+        trending.record(self.post.pk, views=1)
+        self.buffer.record(self.post.pk, 2)
+        self.buffer.record(self.other.pk, 2)
+        with CaptureQueriesContext(connection) as queries:
+            self.buffer.flush()
+        activity_writes = [
+            query for query in queries.captured_queries
+            if 'posts_activity' in query['sql']
+        ]
+        self.assertEqual(len(activity_writes), 2)
+        self.assertEqual(
+            sorted(Activity.objects.values_list('post_id', 'views')),
+            [(self.post.pk, 3), (self.other.pk, 2)],
+        )
+
+    def test_expired_counter_not_fatal(self):
+        self.buffer.record(self.post.pk)
+        self.buffer.spill()
+        with mock.patch.object(
+            counters.cache, 'decr', side_effect=ValueError
+        ):
+            self.assertEqual(self.buffer.flush(), 0)
+
+    def test_deleted_post_dropped(self):
+        gone = Post.objects.create(author=self.author, text='Удалённый')
+        self.buffer.record(gone.pk)
+        self.buffer.record(self.post.pk)
+        gone.delete()
+        self.assertEqual(self.buffer.flush(), 1)
+        self.assertEqual(self.buffer.flush(), 0)
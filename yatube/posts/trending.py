@@ -0,0 +1,95 @@
+import heapq
+import time
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import Activity, Group, Post
+
+BUCKET_SECONDS: int = 60 * 60
+WINDOW_BUCKETS: int = 48
+HALF_LIFE_BUCKETS: int = 6
+COMMENT_WEIGHT: int = 5
+VIEW_WEIGHT: int = 1
+TRENDING_SIZE: int = 10
+TRENDING_TIMEOUT: int = 60
+TRENDING_KEY = 'trending'
+
+
+def current_bucket():
+    return int(time.time() // BUCKET_SECONDS)
+
+
+def record(post_id, comments=0, views=0):
+    """Добавляет активность поста в корзину текущего часа."""
+    bucket = current_bucket()
+    counters = Activity.objects.filter(post_id=post_id, bucket=bucket)
+    changes = {
+        'comments': F('comments') + comments,
+        'views': F('views') + views,
+    }
+    if counters.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            Activity.objects.create(
+                post_id=post_id, bucket=bucket, comments=comments, views=views
+            )
+    except IntegrityError:
+        counters.update(**changes)
+
+
+def record_many(views):
+    """Добавляет просмотры многих постов в корзину текущего часа.
+
+    Недостающие строки корзины создаются одним INSERT с нулями, затем
+    идёт по одному UPDATE на каждое различное приращение.
+    """
+    bucket = current_bucket()
+    Activity.objects.bulk_create(
+        [Activity(post_id=post_id, bucket=bucket) for post_id in views],
+        ignore_conflicts=True,
+    )
+    by_count = defaultdict(list)
+    for post_id, count in views.items():
+        by_count[count].append(post_id)
+    for count, ids in by_count.items():
+        Activity.objects.filter(post_id__in=ids, bucket=bucket).update(
+            views=F('views') + count
+        )
+
+
+def rank():
+    """Считает рейтинг по корзинам окна с экспоненциальным затуханием."""
+    now = current_bucket()
+    post_scores = defaultdict(float)
+    group_scores = defaultdict(float)
+    rows = Activity.objects.filter(
+        bucket__gt=now - WINDOW_BUCKETS
+    ).values_list('post_id', 'post__group_id', 'bucket', 'comments', 'views')
+    for post_id, group_id, bucket, comments, views in rows.iterator():
+        score = (
+            (COMMENT_WEIGHT * comments + VIEW_WEIGHT * views)
+            * 0.5 ** ((now - bucket) / HALF_LIFE_BUCKETS)
+        )
+        post_scores[post_id] += score
+        if group_id is not None:
+            group_scores[group_id] += score
+    post_ids = heapq.nlargest(TRENDING_SIZE, post_scores, post_scores.get)
+    group_ids = heapq.nlargest(TRENDING_SIZE, group_scores, group_scores.get)
+    posts = Post.objects.select_related('author', 'group').in_bulk(post_ids)
+    groups = Group.objects.in_bulk(group_ids)
+    return {
+        'posts': [posts[pk] for pk in post_ids if pk in posts],
+        'groups': [groups[pk] for pk in group_ids if pk in groups],
+    }
+
+
+def trending():
+    data = cache.get(TRENDING_KEY)
+    if data is None:
+        data = rank()
+        cache.set(TRENDING_KEY, data, TRENDING_TIMEOUT)
+    return data
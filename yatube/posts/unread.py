@@ -0,0 +1,91 @@
+import time
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .follows import following_ids
+from .models import FeedWatermark, Post
+
+UNREAD_TIMEOUT: int = 60 * 10
+
+
+def unread_key(user_id):
+    return f'unread:{user_id}'
+
+
+def generation_key(author_id):
+    return f'unread:author:{author_id}'
+
+
+def generations(author_ids):
+    """Поколения авторов: растут с каждым их новым или удалённым постом.
+
+    Вытесненное из кеша поколение заводится заново от часов, поэтому
+    не совпадает ни с одним запомненным раньше.
+    """
+    keys = {generation_key(author_id): author_id for author_id in author_ids}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return {keys[key]: value for key, value in found.items()}
+
+
+def watermark(user):
+    """Время последнего просмотра ленты; до первого — регистрация."""
+    seen = FeedWatermark.objects.filter(user=user).values_list(
+        'seen', flat=True
+    ).first()
+    return seen or user.date_joined
+
+
+def unread_count(user):
+    """Число постов подписок новее отметки, из кеша.
+
+    Счётчик хранится вместе с поколениями авторов, при которых посчитан,
+    и верен, пока они не сдвинулись. Промах считается по индексу
+    (author, pub_date) и бывает только после новых постов, подписок
+    и отписок.
+    """
+    if not user.is_authenticated:
+        return 0
+    key = unread_key(user.pk)
+    authors = following_ids(user)
+    stamps = generations(authors)
+    cached = cache.get(key)
+    if cached is not None and cached[1] == stamps:
+        return cached[0]
+    count = Post.objects.filter(
+        author_id__in=authors, pub_date__gt=watermark(user)
+    ).count() if authors else 0
+    cache.set(key, (count, stamps), UNREAD_TIMEOUT)
+    return count
+
+
+def mark_seen(user):
+    FeedWatermark.objects.update_or_create(
+        user=user, defaults={'seen': timezone.now()}
+    )
+    stamps = generations(following_ids(user))
+    cache.set(unread_key(user.pk), (0, stamps), UNREAD_TIMEOUT)
+
+
+def forget(user_ids):
+    cache.delete_many([unread_key(user_id) for user_id in user_ids])
+
+
+def authors_changed(author_ids):
+    """Сдвигает поколения авторов: счётчики их подписчиков устаревают.
+
+    Стоит одного обращения к кешу на автора, сколько бы у него ни было
+    подписчиков.
+    """
+    for author_id in author_ids:
+        key = generation_key(author_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, time.time_ns(), None):
+                cache.incr(key)
@@ -7,12 +7,75 @@ app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('fragment/', views.index_fragment, name='index_fragment'),
+    path('trending/', views.trending_posts, name='trending'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path(
+        'group/<slug:slug>/fragment/',
+        views.group_fragment,
+        name='group_fragment'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/fragment/',
+        views.profile_fragment,
+        name='profile_fragment'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path('tags/<str:name>/', views.tag_posts, name='tag_posts'),
+    path('mentions/', views.mentions, name='mentions'),
+    path('suggest/', views.suggest, name='suggest'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/unread/', views.unread_count, name='unread_count'),
+    path('follow/unread/poll/', views.unread_poll, name='unread_poll'),
+    path(
+        'follow/fragment/',
+        views.follow_fragment,
+        name='follow_fragment'
+    ),
+    path('archive/<int:year>/', views.site_archive, name='archive'),
+    path(
+        'archive/<int:year>/<int:month>/',
+        views.site_archive,
+        name='archive'
+    ),
+    path(
+        'archive/<int:year>/<int:month>/<int:day>/',
+        views.site_archive,
+        name='archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'group/<slug:slug>/archive/<int:year>/<int:month>/<int:day>/',
+        views.group_archive,
+        name='group_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
+    path(
+        'profile/<str:username>/archive/<int:year>/<int:month>/<int:day>/',
+        views.profile_archive,
+        name='profile_archive'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -23,5 +86,20 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
-    path('posts/<int:post_id>/comment/', views.add_comment, name='add_comment')
+    path(
+        'posts/<int:post_id>/comment/',
+        views.add_comment,
+        name='add_comment'
+    ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path('sitemap.xml', views.sitemap_index, name='sitemap_index'),
+    path(
+        'sitemap-<slug:section>-<int:chunk>.xml',
+        views.sitemap,
+        name='sitemap'
+    ),
 ]
@@ -1,9 +1,165 @@
-from django.core.paginator import Paginator
+import hashlib
+import re
+from datetime import datetime, timedelta
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .follows import following_ids
 
 MAX_POSTS_ON_PAGE: int = 10
+MAX_RECOMMENDATIONS: int = 5
+MAX_COMMENTS_ON_PAGE: int = 20
+COUNT_TIMEOUT: int = 60
+FRAGMENT_TIMEOUT: int = 60
+# Курсор ленты: время публикации в микросекундах от эпохи и pk.
+FEED_CURSOR_RE = re.compile(r'(\d{1,18})-(\d{1,18})')
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который берёт COUNT(*) из кеша.
+
+    Число объектов может отставать не больше чем на COUNT_TIMEOUT секунд.
+    """
+
+    @cached_property
+    def count(self):
+        query = str(self.object_list.query).encode()
+        key = f'count:{hashlib.md5(query).hexdigest()}'
+        count = cache.get(key)
+        if count is None:
+            count = self.object_list.count()
+            cache.set(key, count, COUNT_TIMEOUT)
+        return count
+
+
+class CountedPaginator(Paginator):
+    """Paginator с заранее известным числом объектов.
+
+    Число берётся из поддерживаемых счётчиков, COUNT(*) не выполняется.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+class LookaheadPaginator(Paginator):
+    """Paginator без COUNT(*): о следующей странице узнаёт по лишней строке.
+
+    После page() count — нижняя оценка, которой хватает для has_next
+    и ссылки на следующую страницу.
+    """
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        objects = [*self.object_list[bottom:bottom + self.per_page + 1]]
+        if not objects and number > 1:
+            raise EmptyPage('Эта страница не содержит результатов')
+        self.count = bottom + len(objects)
+        return self._get_page(objects[:self.per_page], number, self)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # Страница за концом ленты: только здесь нужен честный COUNT(*).
+            return self.page(self.num_pages)
+
+    def validate_number(self, number):
+        # Базовая проверка сверяется с num_pages, то есть считает COUNT(*).
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('Номер страницы не целое число')
+        if number < 1:
+            raise EmptyPage('Номер страницы меньше 1')
+        return number
 
 
-def by_page(request, list):
-    paginator = Paginator(list, MAX_POSTS_ON_PAGE)
+def by_page(request, list, count=None, lookahead=False):
+    """Страница ленты.
+
+    count — число объектов из счётчиков; lookahead — не считать вовсе.
+    Без них число берётся из кеша.
+    """
+    if count is not None:
+        paginator = CountedPaginator(list, MAX_POSTS_ON_PAGE, count)
+    elif lookahead:
+        paginator = LookaheadPaginator(list, MAX_POSTS_ON_PAGE)
+    else:
+        paginator = CachedCountPaginator(list, MAX_POSTS_ON_PAGE)
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def by_cursor(request, list, size):
+    """Страница по курсору: объекты с pk меньше ?cursor=, по убыванию pk.
+
+    Возвращает объекты страницы и курсор следующей (None, если её нет).
+    """
+    cursor = request.GET.get('cursor')
+    if cursor and cursor.isdigit():
+        list = list.filter(pk__lt=int(cursor))
+    objects = [*list.order_by('-pk')[:size + 1]]
+    if len(objects) > size:
+        return objects[:size], objects[size - 1].pk
+    return objects, None
+
+
+def feed_cursor(post):
+    """Курсор ленты, продолжающей её сразу после post."""
+    return f'{(post.pub_date - EPOCH) // MICROSECOND}-{post.pk}'
+
+
+def parse_feed_cursor(value):
+    """(pub_date, pk) из курсора ленты или None, если он не такой."""
+    match = FEED_CURSOR_RE.fullmatch(value or '')
+    if match is None:
+        return None
+    microseconds, pk = map(int, match.groups())
+    try:
+        return EPOCH + microseconds * MICROSECOND, pk
+    except OverflowError:
+        return None
+
+
+def by_feed_cursor(list, cursor, size):
+    """Порция ленты после cursor в порядке полных страниц.
+
+    Ключ (pub_date, pk) — тот же, что у Post.Meta.ordering, поэтому
+    порция продолжает страницу без пропусков и повторов.
+    """
+    if cursor is not None:
+        pub_date, pk = cursor
+        list = list.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+        )
+    objects = [*list.order_by('-pub_date', '-pk')[:size + 1]]
+    if len(objects) > size:
+        return objects[:size], feed_cursor(objects[size - 1])
+    return objects, None
+
+
+def page_cursor(page_obj):
+    """Курсор ленты-фрагмента, продолжающей страницу page_obj."""
+    return feed_cursor(page_obj[-1]) if page_obj.has_next() else None
+
+
+def recommendations(user):
+    """Рекомендации подписок без уже отслеживаемых авторов.
+
+    Таблица пересчитывается раз в сутки, а подписаться на
+    рекомендованного автора можно сразу.
+    """
+    if not user.is_authenticated:
+        return []
+    return user.recommendations.exclude(
+        author_id__in=[user.pk, *following_ids(user)]
+    ).select_related('author')[:MAX_RECOMMENDATIONS]
@@ -1,19 +1,53 @@
+import hashlib
+from functools import partial
+
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import (Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.urls import reverse, reverse_lazy
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from core import surrogate
 
+from . import (archive, autocomplete, counters, hashtags, purge, recent,
+               sitemaps, trending, unread)
+from .follows import following_ids
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .utils import by_page
+from .models import ArchiveBucket, Comment, Follow, Group, Post, Tag, User
+from .tasks import warm_thumbnails
+from .utils import (FRAGMENT_TIMEOUT, MAX_COMMENTS_ON_PAGE,
+                    MAX_POSTS_ON_PAGE, by_cursor, by_feed_cursor, by_page,
+                    page_cursor, parse_feed_cursor, recommendations)
 
 
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.all()
-    page_obj = by_page(request, post_list)
+    page_obj = by_page(
+        request, post_list, count=archive.total(ArchiveBucket.SITE, 0)
+    )
     context = {
         'page_obj': page_obj,
+        # Шаблон вызовет сам и только при промахе кеша фрагмента.
+        'next_cursor': partial(page_cursor, page_obj),
+        'fragment_url': reverse('posts:index_fragment'),
+        'trending_groups': trending.trending()['groups'],
+        'generation': purge.generation(),
     }
+    purge.tag_posts(request, page_obj, purge.FEED_KEY)
+    return render(request, template, context)
+
+
+def trending_posts(request):
+    template = 'posts/trending.html'
+    context = {
+        'trending': trending.trending(),
+    }
+    surrogate.add(request, purge.FEED_KEY)
     return render(request, template, context)
 
 
@@ -21,45 +55,277 @@ def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     post_list = group.posts.all()
-    page_obj = by_page(request, post_list)
+    page_obj = by_page(
+        request, post_list,
+        count=archive.total(ArchiveBucket.GROUP, group.pk),
+    )
     context = {
         'group': group,
         'page_obj': page_obj,
+        'next_cursor': page_cursor(page_obj),
+        'fragment_url': reverse('posts:group_fragment', args=[slug]),
     }
+    purge.tag_posts(request, page_obj, purge.group_key(group.pk))
     return render(request, template, context)
 
 
 def profile(request, username):
     template = 'posts/profile.html'
     author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    count = post_list.count()
-    page_obj = by_page(request, post_list)
+    post_list = author.posts.select_related('author', 'group')
+    count = archive.total(ArchiveBucket.AUTHOR, author.pk)
+    page_obj = by_page(request, post_list, count=count)
     context = {
         'author': author,
         'count': count,
         'page_obj': page_obj,
-        'following': (request.user.is_authenticated
-                      and author.following.filter(user=request.user).exists()),
+        'next_cursor': page_cursor(page_obj),
+        'fragment_url': reverse('posts:profile_fragment', args=[username]),
+        'following': author.pk in following_ids(request.user),
+        'recommendations': recommendations(request.user),
+    }
+    purge.tag_posts(request, page_obj, purge.author_key(author.pk))
+    return render(request, template, context)
+
+
+def archive_page(request, bucket, url, post_list, date, context):
+    template = 'posts/archive.html'
+    try:
+        start, end = archive.date_range(*date)
+    except ValueError:
+        raise Http404
+    post_list = post_list.filter(pub_date__gte=start, pub_date__lt=end)
+    scope, object_id = bucket
+    url_name, url_args = url
+    date = tuple(part for part in date if part)
+    navigation = {
+        level: [
+            {
+                'date': parts,
+                'count': count,
+                'url': reverse(url_name, args=[*url_args, *parts]),
+                'active': parts == date[:len(parts)],
+            }
+            for parts, count in buckets
+        ]
+        for level, buckets in archive.navigation(
+            scope, object_id, *date[:2]
+        ).items()
+    }
+    count = next(
+        (
+            bucket['count']
+            for buckets in navigation.values()
+            for bucket in buckets
+            if bucket['date'] == date
+        ),
+        0,
+    )
+    page_obj = by_page(request, post_list, count=count)
+    context.update({
+        'date': start,
+        'level': len(date),
+        'navigation': navigation,
+        'page_obj': page_obj,
+    })
+    purge.tag_posts(request, page_obj, purge.SCOPE_KEYS[scope](object_id))
+    return render(request, template, context)
+
+
+def site_archive(request, year, month=None, day=None):
+    return archive_page(
+        request,
+        (ArchiveBucket.SITE, 0),
+        ('posts:archive', []),
+        Post.objects.select_related('author', 'group'),
+        (year, month, day),
+        {},
+    )
+
+
+def group_archive(request, slug, year, month=None, day=None):
+    group = get_object_or_404(Group, slug=slug)
+    return archive_page(
+        request,
+        (ArchiveBucket.GROUP, group.pk),
+        ('posts:group_archive', [slug]),
+        group.posts.select_related('author', 'group'),
+        (year, month, day),
+        {'group': group},
+    )
+
+
+def profile_archive(request, username, year, month=None, day=None):
+    author = get_object_or_404(User, username=username)
+    return archive_page(
+        request,
+        (ArchiveBucket.AUTHOR, author.pk),
+        ('posts:profile_archive', [username]),
+        author.posts.select_related('author', 'group'),
+        (year, month, day),
+        {'author': author},
+    )
+
+
+def tag_posts(request, name):
+    template = 'posts/tag.html'
+    tag = get_object_or_404(Tag, name=hashtags.normalize(name))
+    posts, next_cursor = by_cursor(
+        request,
+        Post.objects.select_related('author', 'group').filter(
+            post_tags__tag=tag
+        ),
+        MAX_POSTS_ON_PAGE,
+    )
+    context = {
+        'tag': tag,
+        'posts': posts,
+        'next_cursor': next_cursor,
+    }
+    purge.tag_posts(request, posts, purge.FEED_KEY)
+    return render(request, template, context)
+
+
+@login_required
+def mentions(request):
+    template = 'posts/mentions.html'
+    posts, next_cursor = by_cursor(
+        request,
+        Post.objects.select_related('author', 'group').filter(
+            mentions__user=request.user
+        ),
+        MAX_POSTS_ON_PAGE,
+    )
+    context = {
+        'posts': posts,
+        'next_cursor': next_cursor,
     }
     return render(request, template, context)
 
 
+def suggest(request):
+    """Подсказки авторов и групп по началу имени: ?q=."""
+    query = request.GET.get('q', '')[:autocomplete.MAX_QUERY_LENGTH]
+    return JsonResponse({'results': autocomplete.suggest(query)})
+
+
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
     comment_form = CommentForm(request.POST or None)
     post = get_object_or_404(Post, pk=post_id)
+    counters.record_view(post.pk)
     count = post.author.posts.count()
-    comments = post.comments.all()
+    comments, next_cursor = by_cursor(
+        request,
+        post.comments.select_related('author'),
+        MAX_COMMENTS_ON_PAGE,
+    )
     context = {
         'count': count,
         'post': post,
+        'post_id': post.pk,
         'form': comment_form,
         'comments': comments,
+        'next_cursor': next_cursor,
     }
+    surrogate.add(request, *purge.post_keys(post))
+    surrogate.add(
+        request, *{purge.author_key(c.author_id) for c in comments}
+    )
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    template = 'posts/includes/comments.html'
+    comments, next_cursor = by_cursor(
+        request,
+        Comment.objects.select_related('author').filter(post_id=post_id),
+        MAX_COMMENTS_ON_PAGE,
+    )
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+        'next_cursor': next_cursor,
+    }
+    surrogate.add(
+        request, purge.post_key(post_id),
+        *{purge.author_key(c.author_id) for c in comments},
+    )
+    return render(request, template, context)
+
+
+def feed_fragment(request, post_list, fragment_url):
+    """Следующая порция ленты без layout: посты и ссылка на продолжение.
+
+    Фрагменты анонимов одинаковы для всех и кешируются целиком.
+    """
+    template = 'posts/includes/feed.html'
+    anonymous = not request.user.is_authenticated
+    cursor = parse_feed_cursor(request.GET.get('cursor'))
+    # В ключ идёт только разобранный курсор, а не строка из запроса.
+    key = 'fragment:' + hashlib.md5(
+        f'{purge.generation()}:{fragment_url}:{cursor}'.encode()
+    ).hexdigest()
+    cached = cache.get(key) if anonymous else None
+    if cached is None:
+        posts, next_cursor = by_feed_cursor(
+            post_list.select_related('author', 'group'),
+            cursor,
+            MAX_POSTS_ON_PAGE,
+        )
+        context = {
+            'posts': posts,
+            'next_cursor': next_cursor,
+            'fragment_url': fragment_url,
+        }
+        html = render_to_string(template, context, request)
+        keys = [tag for post in posts for tag in purge.post_keys(post)]
+        if anonymous:
+            cache.set(key, (html, keys), FRAGMENT_TIMEOUT)
+    else:
+        html, keys = cached
+    surrogate.add(request, *keys)
+    response = HttpResponse(html)
+    patch_cache_control(
+        response,
+        public=anonymous,
+        private=not anonymous,
+        max_age=FRAGMENT_TIMEOUT,
+    )
+    return response
+
+
+def index_fragment(request):
+    return feed_fragment(
+        request, Post.objects.all(), reverse('posts:index_fragment')
+    )
+
+
+def group_fragment(request, slug):
+    return feed_fragment(
+        request,
+        Post.objects.filter(group__slug=slug),
+        reverse('posts:group_fragment', args=[slug]),
+    )
+
+
+def profile_fragment(request, username):
+    return feed_fragment(
+        request,
+        Post.objects.filter(author__username=username),
+        reverse('posts:profile_fragment', args=[username]),
+    )
+
+
+@login_required
+def follow_fragment(request):
+    return feed_fragment(
+        request,
+        Post.objects.filter(author__following__user=request.user),
+        reverse('posts:follow_fragment'),
+    )
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -71,6 +337,10 @@ def post_create(request):
         post = post_form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            warm_thumbnails.delay(
+                post.pk, dedup_key=f'thumbnails:{post.pk}'
+            )
         return redirect(reverse_lazy('posts:profile',
                                      args=[request.user.username]))
     return render(request, template, {'form': post_form, 'is_edit': False})
@@ -90,6 +360,10 @@ def post_edit(request, post_id):
         )
         if post_form.is_valid():
             post = post_form.save()
+            if 'image' in post_form.changed_data and post.image:
+                warm_thumbnails.delay(
+                    post.pk, dedup_key=f'thumbnails:{post.pk}'
+                )
             return redirect(reverse_lazy('posts:post_detail', args=[post.pk]))
     post_form = PostForm(instance=post)
     return render(request, template, {'form': post_form, 'is_edit': True})
@@ -113,18 +387,48 @@ def follow_index(request):
     post_list = Post.objects.posts = Post.objects.select_related(
         'author', 'group'
     ).filter(author__following__user=request.user)
-    page_obj = by_page(request, post_list)
+    author_ids = following_ids(request.user)
+    first = request.GET.get('page', '1') == '1'
+    if first and len(author_ids) <= recent.MERGE_MAX_AUTHORS:
+        page_obj = recent.first_page(post_list, author_ids)
+    else:
+        page_obj = by_page(request, post_list, lookahead=True)
+    # Отметка двигается, только когда было что читать: без записи на
+    # каждую перезагрузку.
+    if first and unread.unread_count(request.user):
+        unread.mark_seen(request.user)
     context = {
         'page_obj': page_obj,
+        'next_cursor': page_cursor(page_obj),
+        'fragment_url': reverse('posts:follow_fragment'),
+        'recommendations': recommendations(request.user),
     }
     return render(request, template, context)
 
 
+@login_required
+def unread_count(request):
+    return JsonResponse({'unread': unread.unread_count(request.user)})
+
+
+def unread_etag(request):
+    if request.user.is_authenticated:
+        return f'unread-{request.user.pk}-{unread.unread_count(request.user)}'
+    return None
+
+
+@login_required
+@condition(etag_func=unread_etag)
+def unread_poll(request):
+    """Как unread_count, но с ETag: пока нового нет, отвечает 304."""
+    return unread_count(request)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.create(user=request.user, author=author)
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username=username)
 
 
@@ -133,3 +437,36 @@ def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(author=author, user=request.user).delete()
     return redirect('posts:profile', username=username)
+
+
+def sitemap_index_lastmod(request):
+    entries = sitemaps.index_entries()
+    return max(lastmod for _, _, lastmod in entries) if entries else None
+
+
+@condition(last_modified_func=sitemap_index_lastmod)
+def sitemap_index(request):
+    base = request.build_absolute_uri('/')[:-1]
+    surrogate.add(request, purge.FEED_KEY)
+    return StreamingHttpResponse(
+        sitemaps.render_index(base, sitemaps.index_entries()),
+        content_type='application/xml',
+    )
+
+
+def sitemap_lastmod(request, section, chunk):
+    if section not in sitemaps.SECTIONS:
+        return None
+    return sitemaps.chunk_lastmod(section, chunk)
+
+
+@condition(last_modified_func=sitemap_lastmod)
+def sitemap(request, section, chunk):
+    if section not in sitemaps.SECTIONS:
+        raise Http404
+    base = request.build_absolute_uri('/')[:-1]
+    surrogate.add(request, purge.FEED_KEY)
+    return StreamingHttpResponse(
+        sitemaps.render_chunk(base, section, chunk),
+        content_type='application/xml',
+    )
@@ -0,0 +1,14 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'name', 'status', 'attempts', 'created',
+                    'finished',)
+    list_filter = ('status',)
+    search_fields = ('name',)
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Task, TaskAdmin)
@@ -0,0 +1,64 @@
+import json
+import multiprocessing
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tasks import queue
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=2,
+            help='0 — выполнять задачи в текущем процессе'
+        )
+        parser.add_argument('--batch', type=int, default=20)
+        parser.add_argument('--poll', type=float, default=1.0)
+        parser.add_argument('--stats-interval', type=float, default=60.0)
+        parser.add_argument('--requeue-after', type=int, default=600)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='выйти, когда готовых задач не останется'
+        )
+
+    def handle(self, *args, **options):
+        queue.discover()
+        pool = None
+        if options['processes']:
+            connections.close_all()
+            pool = ProcessPoolExecutor(
+                options['processes'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        run = pool.map if pool else map
+        results = Counter()
+        reported = time.monotonic()
+        try:
+            while True:
+                queue.requeue_stale(options['requeue_after'])
+                ids = queue.claim(options['batch'])
+                results.update(run(queue.execute, ids))
+                if not ids:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                if time.monotonic() - reported > options['stats_interval']:
+                    self.report(results)
+                    reported = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+        self.report(results)
+
+    def report(self, results):
+        self.stdout.write(json.dumps({**queue.stats(), **results}))
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.16 on 2026-10-19 19:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Name')),
+                ('arguments', models.TextField(default='[]', verbose_name='Arguments')),
+                ('dedup_key', models.CharField(blank=True, max_length=200, null=True, unique=True, verbose_name='Deduplication key')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Max attempts')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Run after')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Started')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Finished')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+            ],
+            options={
+                'ordering': ['pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'run_after'], name='tasks_task_status_03f913_idx'),
+        ),
+    ]
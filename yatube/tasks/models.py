@@ -0,0 +1,55 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=200, verbose_name='Name')
+    arguments = models.TextField(default='[]', verbose_name='Arguments')
+    dedup_key = models.CharField(
+        max_length=200,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Deduplication key'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name='Status'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0, verbose_name='Attempts'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=3, verbose_name='Max attempts'
+    )
+    run_after = models.DateTimeField(
+        default=timezone.now, verbose_name='Run after'
+    )
+    created = models.DateTimeField(auto_now_add=True, verbose_name='Created')
+    started = models.DateTimeField(null=True, blank=True,
+                                   verbose_name='Started')
+    finished = models.DateTimeField(null=True, blank=True,
+                                    verbose_name='Finished')
+    error = models.TextField(blank=True, verbose_name='Error')
+
+    def __str__(self):
+        return f'{self.name} [{self.status}]'
+
+    class Meta:
+        ordering = ['pk']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
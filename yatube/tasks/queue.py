@@ -0,0 +1,128 @@
+import json
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Task
+
+REGISTRY = {}
+RETRY_DELAY: int = 10
+STATS_SAMPLE: int = 100
+
+
+def task(func):
+    """Регистрирует функцию как задачу: func.delay(...) ставит её в очередь.
+
+    Аргументы задачи должны сериализоваться в JSON.
+    """
+    name = f'{func.__module__}.{func.__name__}'
+    REGISTRY[name] = func
+    func.delay = lambda *args, **kwargs: enqueue(name, *args, **kwargs)
+    return func
+
+
+def discover():
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, *args, dedup_key=None, delay=0, **kwargs):
+    """Ставит задачу в очередь после фиксации текущей транзакции.
+
+    Пока задача с тем же dedup_key не выполнена, повторы отбрасываются.
+    """
+    def insert():
+        try:
+            with transaction.atomic():
+                Task.objects.create(
+                    name=name,
+                    arguments=json.dumps([args, kwargs]),
+                    dedup_key=dedup_key,
+                    run_after=timezone.now() + timedelta(seconds=delay),
+                )
+        except IntegrityError:
+            pass
+    transaction.on_commit(insert)
+
+
+def claim(limit):
+    """Переводит до limit готовых задач в RUNNING и возвращает их id."""
+    now = timezone.now()
+    ready = Task.objects.filter(
+        status=Task.PENDING, run_after__lte=now
+    ).values_list('pk', flat=True)[:limit]
+    return [
+        pk for pk in ready
+        if Task.objects.filter(pk=pk, status=Task.PENDING).update(
+            status=Task.RUNNING, started=now, attempts=F('attempts') + 1
+        )
+    ]
+
+
+def execute(pk):
+    """Выполняет задачу; при ошибке повторяет её с нарастающей паузой."""
+    if not REGISTRY:
+        discover()
+    job = Task.objects.get(pk=pk)
+    args, kwargs = json.loads(job.arguments)
+    try:
+        REGISTRY[job.name](*args, **kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Task.PENDING
+            job.run_after = timezone.now() + timedelta(
+                seconds=RETRY_DELAY * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Task.FAILED
+            job.dedup_key = None
+            job.finished = timezone.now()
+    else:
+        job.status = Task.DONE
+        job.dedup_key = None
+        job.finished = timezone.now()
+    job.save(update_fields=[
+        'status', 'dedup_key', 'run_after', 'finished', 'error'
+    ])
+    return job.status
+
+
+def requeue_stale(seconds):
+    """Возвращает в очередь задачи, зависшие в RUNNING после сбоя воркера.
+
+    Попытку claim уже засчитал, так что задача, которая раз за разом
+    роняет воркер, после max_attempts помечается FAILED.
+    """
+    now = timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING, started__lt=now - timedelta(seconds=seconds),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED,
+        dedup_key=None,
+        finished=now,
+        error='Воркер остановился, не завершив задачу',
+    )
+    return stale.update(status=Task.PENDING)
+
+
+def stats():
+    """Глубина очереди и средние задержка до старта и время выполнения."""
+    recent = Task.objects.filter(status=Task.DONE).order_by(
+        '-finished'
+    ).values_list('created', 'started', 'finished')[:STATS_SAMPLE]
+    waits = [(started - created).total_seconds()
+             for created, started, _ in recent]
+    runs = [(finished - started).total_seconds()
+            for _, started, finished in recent]
+    return {
+        'depth': Task.objects.filter(status=Task.PENDING).count(),
+        'running': Task.objects.filter(status=Task.RUNNING).count(),
+        'failed': Task.objects.filter(status=Task.FAILED).count(),
+        'latency': sum(waits) / len(waits) if waits else None,
+        'duration': sum(runs) / len(runs) if runs else None,
+    }
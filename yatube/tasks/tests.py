@@ -0,0 +1,121 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts.models import User
+
+from . import queue
+from .models import Task
+
+CALLS = []
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@queue.task
+def remember(value):
+    CALLS.append(value)
+
+
+@queue.task
+def explode():
+    raise RuntimeError('boom')
+
+
+class QueueTest(TransactionTestCase):
+
+    def setUp(self):
+        CALLS.clear()
+
+    def run_worker(self):
+        out = StringIO()
+        call_command('run_worker', processes=0, once=True, stdout=out)
+        return json.loads(out.getvalue().splitlines()[-1])
+
+    def test_runs_after_commit(self):
+        remember.delay(1)
+        remember.delay(2)
+        report = self.run_worker()
+        self.assertEqual(CALLS, [1, 2])
+        self.assertEqual(report['done'], 2)
+        self.assertEqual(report['depth'], 0)
+        self.assertIsNotNone(report['latency'])
+
+    def test_deduplication(self):
+        remember.delay(1, dedup_key='same')
+        remember.delay(2, dedup_key='same')
+        self.assertEqual(Task.objects.count(), 1)
+        self.run_worker()
+        remember.delay(3, dedup_key='same')
+        self.run_worker()
+        self.assertEqual(CALLS, [1, 3])
+
+    def test_retries_then_fails(self):
+        explode.delay()
+        self.run_worker()
+        job = Task.objects.get()
+        self.assertEqual(job.status, Task.PENDING)
+        self.assertIn('boom', job.error)
+
+        job.attempts = job.max_attempts - 1
+        job.run_after = job.created
+        job.save()
+        report = self.run_worker()
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertEqual(report['failed'], 1)
+
+    def test_stale_tasks_requeued(self):
+        remember.delay(1)
+        self.assertEqual(queue.claim(10), [Task.objects.get().pk])
+        self.assertEqual(queue.claim(10), [])
+        self.assertEqual(queue.requeue_stale(-1), 1)
+        self.run_worker()
+        self.assertEqual(CALLS, [1])
+
+    def test_crashing_task_fails_after_max_attempts(self):
+        remember.delay(1)
+        job = Task.objects.get()
+        for _ in range(job.max_attempts):
+            self.assertEqual(queue.claim(10), [job.pk])
+            # Воркер упал посреди задачи.
+            queue.requeue_stale(-1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Task.FAILED)
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.assertIsNone(job.dedup_key)
+        self.assertEqual(queue.claim(10), [])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostTasksTest(TransactionTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_post_create_enqueues_thumbnails(self):
+        user = User.objects.create_user(username='auth')
+        client = Client()
+        client.force_login(user)
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        client.post(reverse('posts:post_create'), {
+            'text': 'Тестовый пост',
+            'image': SimpleUploadedFile('small.gif', small_gif, 'image/gif'),
+        })
+        job = Task.objects.get()
+        self.assertEqual(job.name, 'posts.tasks.warm_thumbnails')
+        self.assertEqual(queue.execute(job.pk), Task.DONE)
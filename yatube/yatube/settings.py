@@ -38,9 +38,15 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.HashingMemoryFileUploadHandler',
+    'posts.uploads.HashingTemporaryFileUploadHandler',
+]
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+# Base of absolute links in emails, which have no request to build them from.
+SITE_URL = 'http://localhost:8000'
 
 # Application definition
 
@@ -49,7 +55,10 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
     'core.apps.CoreConfig',
-    'django.contrib.admin',
+    'tasks.apps.TasksConfig',
+    # Admin modules are discovered in urls.py, so management commands
+    # and workers that never load the URLconf skip them.
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -66,8 +75,36 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.ratelimit.RateLimitMiddleware',
+    'core.surrogate.SurrogateKeyMiddleware',
 ]
 
+# Reverse proxy cache: responses are tagged with surrogate keys, and
+# model changes POST the affected keys to every endpoint listed here.
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+SURROGATE_PURGE_ENDPOINTS = []
+
+# Near-duplicate posts: 'flag' marks them for moderators,
+# 'reject' refuses them in the post form.
+NEAR_DUPLICATE_ACTION = 'flag'
+
+# Token bucket rate limits: view name -> {'user' | 'ip': 'count/period'}.
+# Anonymous requests fall back from 'user' to the client IP.
+RATELIMITS = {
+    'posts:post_create': {'user': '10/m', 'ip': '60/m'},
+    'posts:add_comment': {'user': '20/m', 'ip': '120/m'},
+    'posts:profile_follow': {
+        'user': '30/m',
+        'ip': '120/m',
+        'methods': ('GET', 'POST'),
+    },
+    'users:signup': {'ip': '5/m'},
+}
+# META key of the client address header set by the trusted reverse proxy,
+# e.g. 'HTTP_X_FORWARDED_FOR'. Without it every client behind the proxy
+# shares one REMOTE_ADDR and one 'ip' bucket.
+RATELIMIT_IP_HEADER = None
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -91,6 +128,8 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'core.context_processors.following.following',
+                'core.context_processors.unread.unread',
             ],
         },
     },
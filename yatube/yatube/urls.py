@@ -3,6 +3,8 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
 
+admin.autodiscover()
+
 handler404 = 'core.views.page_not_found'
 
 urlpatterns = [
@@ -5,3 +5,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Индекс подсказок строится в фоне, пока сервер уже принимает запросы;
+# там же раз в секунду сбрасываются буферизованные просмотры.
+from posts import autocomplete, counters  # noqa: E402
+
+autocomplete.start()
+counters.start()